@@ -0,0 +1,171 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_EXHAUSTED = object()
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on jobs in flight, the
+    way TCP sizes its congestion window. Every success adds 1/limit, so the
+    limit grows by about one per full window of jobs. An error, or a job much
+    slower than the smoothed baseline, multiplies it by decrease_factor, at
+    most once per cooldown seconds so one burst of failures counts once.
+    """
+
+    def __init__(
+        self,
+        initial=8,
+        min_limit=1,
+        max_limit=64,
+        decrease_factor=0.7,
+        slow_factor=3.0,
+        cooldown=5.0,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.slow_factor = slow_factor
+        self.cooldown = cooldown
+        self.baseline = None  # Smoothed seconds per unit of work
+        self.last_decrease = float("-inf")
+
+    @property
+    def concurrency(self):
+        return max(self.min_limit, int(self.limit))
+
+    def record(self, latency, error=False, size=1):
+        cost = latency / max(size, 1)
+        slow = self.baseline is not None and cost > self.baseline * self.slow_factor
+        if not error:
+            if self.baseline is None:
+                self.baseline = cost
+            else:
+                # Clamped so a few cache hits or stragglers don't swing the baseline
+                cost = min(
+                    max(cost, self.baseline / self.slow_factor),
+                    self.baseline * self.slow_factor,
+                )
+                self.baseline = 0.9 * self.baseline + 0.1 * cost
+
+        if error or slow:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.cooldown:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+
+class ThroughputMeter:
+    """Totals plus a rolling window of finished jobs for live clips/hour."""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.start_time = time.monotonic()
+        self.events = deque()  # (finish time, error, latency)
+        self.succeeded = 0
+        self.failed = 0
+
+    def record(self, latency, error=False):
+        now = time.monotonic()
+        self.events.append((now, error, latency))
+        if error:
+            self.failed += 1
+        else:
+            self.succeeded += 1
+        while self.events and self.events[0][0] < now - self.window:
+            self.events.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        while self.events and self.events[0][0] < now - self.window:
+            self.events.popleft()
+        span = max(min(self.window, now - self.start_time), 1e-9)
+        recent = len(self.events)
+        errors = sum(1 for _, error, _ in self.events if error)
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "clips_per_hour": (recent - errors) / span * 3600,
+            "error_rate": errors / recent if recent else 0.0,
+            "mean_latency": (
+                sum(latency for _, _, latency in self.events) / recent
+                if recent
+                else 0.0
+            ),
+            "elapsed": now - self.start_time,
+        }
+
+    def report(self, concurrency=None, in_flight=None):
+        stats = self.snapshot()
+        line = (
+            f"[{stats['elapsed']:.0f}s] {stats['succeeded']} ok, {stats['failed']} failed, "
+            f"{stats['clips_per_hour']:.0f} clips/h, "
+            f"{stats['error_rate']:.0%} errors, {stats['mean_latency']:.1f}s latency"
+        )
+        if concurrency is not None:
+            line += f", limit {concurrency} ({in_flight} in flight)"
+        return line
+
+
+def run_adaptive(
+    func,
+    items,
+    controller=None,
+    size=None,
+    on_result=None,
+    report_interval=30.0,
+):
+    """
+    Calls func(*item) on a thread pool for every tuple pulled lazily from
+    items, keeping controller.concurrency calls in flight. A call fails when
+    it raises or returns False; size(item), when given, normalizes its latency
+    so long texts aren't mistaken for a slow API. on_result(item, ok, error)
+    runs on the calling thread and a progress line is printed every
+    report_interval seconds. Returns the ThroughputMeter.
+    """
+    controller = controller or AIMDController()
+    meter = ThroughputMeter()
+    items = iter(items)
+    in_flight = {}
+    exhausted = False
+    last_report = time.monotonic()
+
+    def timed(item):
+        start = time.monotonic()
+        try:
+            ok = func(*item) is not False
+            return ok, None, time.monotonic() - start
+        except Exception as e:
+            return False, e, time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
+        while True:
+            while not exhausted and len(in_flight) < controller.concurrency:
+                item = next(items, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    exhausted = True
+                    break
+                in_flight[executor.submit(timed, item)] = item
+            if not in_flight:
+                break
+
+            done, _ = wait(
+                in_flight, timeout=report_interval, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                item = in_flight.pop(future)
+                ok, error, latency = future.result()
+                controller.record(latency, not ok, size(item) if size else 1)
+                meter.record(latency, not ok)
+                if on_result:
+                    on_result(item, ok, error)
+
+            if time.monotonic() - last_report >= report_interval:
+                print(meter.report(controller.concurrency, len(in_flight)))
+                last_report = time.monotonic()
+
+    return meter
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import struct
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import soundfile as sf
+
+from clip_manifest import load_manifest
+from sidecar import replacing, sidecar_path
+from tts_format import TTS_SAMPLE_RATE
+from utils_audio import read_wav_header
+
+QC_SUFFIX = ".qc.npz"
+# Failure reasons, stored as their index; 0 is a clip that passed
+REASONS = [
+    "",
+    "unreadable",
+    "truncated",
+    "format",
+    "empty",
+    "duration",
+    "clipping",
+    "silence",
+    "speech_rate",
+]
+QC_LIMITS = {
+    "sample_rate": TTS_SAMPLE_RATE,
+    "channels": 1,
+    "min_duration": 0.5,
+    "max_duration": 30.0,
+    # Share of samples at or above clip_level of full scale
+    "clip_level": 0.999,
+    "max_clipping": 0.001,
+    # Share of 10 ms frames quieter than silence_db
+    "silence_db": -40.0,
+    "max_silence": 0.6,
+    # Characters of the sentence (the _{len} name suffix) per second of speech
+    "min_chars_per_second": 5.0,
+    "max_chars_per_second": 30.0,
+}
+METRICS = ("durations", "clipping", "silence", "chars_per_second")
+
+
+def qc_path(directory):
+    return sidecar_path(directory, QC_SUFFIX)
+
+
+def clip_metrics(samples, sample_rate, limits):
+    """
+    (clipping share, silence share, seconds from the first to the last
+    non-silent frame) of float samples shaped (frames, channels).
+    """
+    clipping = float(np.mean(np.abs(samples) >= limits["clip_level"]))
+    mono = samples.mean(axis=1)
+    frame = max(sample_rate // 100, 1)
+    frames = mono[: len(mono) // frame * frame].reshape(-1, frame)
+    if not len(frames):
+        return clipping, 1.0, 0.0
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    with np.errstate(divide="ignore"):
+        loud = 20 * np.log10(rms) >= limits["silence_db"]
+    voiced = np.flatnonzero(loud)
+    speech = (voiced[-1] - voiced[0] + 1) * frame / sample_rate if len(voiced) else 0.0
+    return clipping, 1.0 - float(loud.mean()), speech
+
+
+def check_clip(path, text_length, limits=QC_LIMITS):
+    """
+    Checks one clip: header, format and duration first, then clipping,
+    silence and speaking rate from its samples. Returns (reason index,
+    duration, clipping, silence, chars per second); NaN for what wasn't
+    measured.
+    """
+    nan = float("nan")
+    try:
+        header = read_wav_header(path)
+    except (OSError, ValueError, struct.error):
+        return REASONS.index("unreadable"), nan, nan, nan, nan
+    if not header["complete"]:
+        return REASONS.index("truncated"), nan, nan, nan, nan
+    if (
+        header["sample_rate"] != limits["sample_rate"]
+        or header["channels"] != limits["channels"]
+    ):
+        return REASONS.index("format"), nan, nan, nan, nan
+    if header["frames"] == 0:
+        return REASONS.index("empty"), 0.0, nan, nan, nan
+    duration = header["frames"] / header["sample_rate"]
+    if not limits["min_duration"] <= duration <= limits["max_duration"]:
+        return REASONS.index("duration"), duration, nan, nan, nan
+
+    try:
+        samples, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    except RuntimeError:  # Includes soundfile's LibsndfileError
+        return REASONS.index("unreadable"), duration, nan, nan, nan
+    clipping, silence, speech = clip_metrics(samples, sample_rate, limits)
+    rate = float(text_length / speech) if text_length >= 0 and speech > 0 else nan
+    if clipping > limits["max_clipping"]:
+        reason = "clipping"
+    elif silence > limits["max_silence"]:
+        reason = "silence"
+    elif text_length >= 0 and not (
+        limits["min_chars_per_second"] <= rate <= limits["max_chars_per_second"]
+    ):
+        reason = "speech_rate"
+    else:
+        reason = ""
+    return REASONS.index(reason), duration, clipping, silence, rate
+
+
+def check_clips(paths, text_lengths, limits):
+    # One batch of clips in a worker process
+    return [check_clip(path, n, limits) for path, n in zip(paths, text_lengths)]
+
+
+class QCTable:
+    """
+    QC results aligned with a ClipManifest: reason codes (indexes into
+    REASONS, 0 for a pass) and the measured duration, clipping and silence
+    shares and characters per second.
+    """
+
+    def __init__(self, codes, durations, clipping, silence, chars_per_second):
+        self.codes = codes
+        self.durations = durations
+        self.clipping = clipping
+        self.silence = silence
+        self.chars_per_second = chars_per_second
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def passed(self):
+        return self.codes == 0
+
+    def reason(self, i):
+        return REASONS[self.codes[i]]
+
+    def summary(self):
+        return Counter(REASONS[code] or "passed" for code in self.codes.tolist())
+
+
+def run_qc(manifest, cache_path=None, workers=None, limits=None, batch_size=256):
+    """
+    QC table of every clip in the manifest. Clips are checked in batches in
+    worker processes; with cache_path, results are saved there and reused for
+    clips whose path, size and mtime are unchanged, as long as the limits are
+    the same.
+    """
+    limits = {**QC_LIMITS, **(limits or {})}
+    signature = json.dumps(limits, sort_keys=True)
+    paths = manifest.paths
+    count = len(paths)
+    codes = np.zeros(count, dtype=np.int8)
+    metrics = {name: np.full(count, np.nan, dtype=np.float32) for name in METRICS}
+
+    todo = np.ones(count, dtype=bool)
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["limits"]) == signature:
+                position = {path: i for i, path in enumerate(cached["paths"].tolist())}
+                found = np.array([position.get(path, -1) for path in paths], dtype=int)
+                hit = found >= 0
+                hit[hit] &= (cached["sizes"][found[hit]] == manifest.sizes[hit]) & (
+                    cached["mtimes"][found[hit]] == manifest.mtimes[hit]
+                )
+                codes[hit] = cached["codes"][found[hit]]
+                for name in METRICS:
+                    metrics[name][hit] = cached[name][found[hit]]
+                todo = ~hit
+
+    pending = np.flatnonzero(todo)
+    if len(pending):
+        batches = [
+            pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+        ]
+        check = partial(check_clips, limits=limits)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                check,
+                [[paths[i] for i in batch.tolist()] for batch in batches],
+                [manifest.text_lengths[batch].tolist() for batch in batches],
+            )
+            for batch, batch_results in zip(batches, results):
+                columns = list(zip(*batch_results))
+                codes[batch] = columns[0]
+                for name, values in zip(METRICS, columns[1:]):
+                    metrics[name][batch] = values
+
+    if cache_path and len(pending):
+        with replacing(cache_path, ".npz") as temp_path:
+            np.savez(
+                temp_path,
+                limits=np.array(signature),
+                paths=np.array(paths, dtype=str),
+                sizes=manifest.sizes,
+                mtimes=manifest.mtimes,
+                codes=codes,
+                **metrics,
+            )
+    return QCTable(codes, *(metrics[name] for name in METRICS))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the audio_*.wav clips of a directory before assembly."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sample-rate", type=int, default=TTS_SAMPLE_RATE)
+    parser.add_argument(
+        "--failed", help="Write the failing clips and their reasons to this file"
+    )
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.directory)
+    table = run_qc(
+        manifest,
+        qc_path(args.directory),
+        args.workers,
+        {"sample_rate": args.sample_rate},
+    )
+    for reason, count in table.summary().most_common():
+        print(f"{reason}: {count}")
+    if args.failed:
+        with open(args.failed, "w", encoding="utf-8") as f:
+            for i in np.flatnonzero(~table.passed).tolist():
+                f.write(f"{manifest.path(i)}\t{table.reason(i)}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Zero crossings of the sinc on each side of the filter centre
+HALF_TAPS = 16
+# Passband edge as a share of the lower Nyquist frequency
+ROLLOFF = 0.945
+KAISER_BETA = 8.6
+READ_FRAMES = 1 << 18
+
+
+@lru_cache(maxsize=None)
+def polyphase_filter(src_rate, dst_rate):
+    """
+    Kaiser-windowed sinc low-pass for resampling src_rate to dst_rate by
+    up/down, split into its up phases: (up, down, kernels, center), where
+    kernels[p] holds taps p, p + up, ... reversed, ready to dot with input.
+    Built once per rate pair and process.
+    """
+    g = math.gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    factor = max(up, down)
+    center = HALF_TAPS * factor
+    n = np.arange(2 * center + 1) - center
+    cutoff = ROLLOFF / factor
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), KAISER_BETA)
+    # Zero-stuffing by up divides the level by up; the filter gives it back
+    taps *= up / taps.sum()
+
+    width = -(-len(taps) // up)
+    padded = np.zeros(width * up)
+    padded[: len(taps)] = taps
+    kernels = padded.reshape(width, up).T[:, ::-1]
+    return up, down, np.ascontiguousarray(kernels, dtype=np.float32), center
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler for mono float32 blocks. Output sample m
+    sits at input time m * src_rate / dst_rate, the same alignment as a
+    one-shot resample of the whole signal, whatever the block sizes.
+    """
+
+    def __init__(self, src_rate, dst_rate):
+        self.up, self.down, self.kernels, self.center = polyphase_filter(
+            src_rate, dst_rate
+        )
+        self.width = self.kernels.shape[1]
+        # Input history, starting at global sample index self.offset
+        self.buffer = np.zeros(self.width - 1, dtype=np.float32)
+        self.offset = -(self.width - 1)
+        self.received = 0
+        self.produced = 0
+
+    def _input_index(self, m):
+        # Newest input sample output m needs
+        return (m * self.down + self.center) // self.up
+
+    def _emit(self, end):
+        count = max(end - self.produced, 0)
+        if count == 0 or len(self.buffer) < self.width:
+            # Nothing new is due, e.g. after a final block of a frame or two
+            return np.empty(0, dtype=np.float32)
+        out = np.empty(count, dtype=np.float32)
+        windows = sliding_window_view(self.buffer, self.width)
+        # Every up-th output uses the same phase and its input window moves by
+        # down samples each time: one strided matrix-vector product per phase
+        for first in range(min(self.up, count)):
+            s = (self.produced + first) * self.down + self.center
+            row = s // self.up - (self.width - 1) - self.offset
+            rows = len(range(first, count, self.up))
+            span = slice(row, row + (rows - 1) * self.down + 1, self.down)
+            if self.up == 1:
+                # Plain decimation (44.1 kHz to 22.05 kHz): np.convolve beats
+                # the strided product even though it computes every sample
+                out[first :: self.up] = np.convolve(
+                    self.buffer[row : span.stop + self.width - 1],
+                    self.kernels[0][::-1],
+                    "valid",
+                )[:: self.down]
+            else:
+                out[first :: self.up] = windows[span] @ self.kernels[s % self.up]
+        self.produced = max(end, self.produced)
+
+        # Drop the input no later output will need
+        keep_from = self._input_index(self.produced) - (self.width - 1)
+        if keep_from > self.offset:
+            self.buffer = self.buffer[keep_from - self.offset :]
+            self.offset = keep_from
+        return out
+
+    def process(self, block):
+        self.buffer = np.concatenate((self.buffer, block.astype(np.float32)))
+        self.received += len(block)
+        # Outputs whose newest input sample has arrived
+        last = self.received - 1
+        end = (last * self.up + self.up - 1 - self.center) // self.down + 1
+        return self._emit(max(end, self.produced))
+
+    def flush(self):
+        # The rest of the output, as if the input went on with silence
+        total = -(-self.received * self.up // self.down)
+        padding = self._input_index(total) + self.width - self.offset
+        self.buffer = np.concatenate(
+            (self.buffer, np.zeros(max(padding - len(self.buffer), 0), np.float32))
+        )
+        return self._emit(total)
+
+
+def convert_file(input_path, output_path, target_sample_rate=22050):
+    """
+    Reads input_path once, block by block, averages its channels to mono,
+    resamples to target_sample_rate and writes a WAV of the same sample
+    format (16-bit if WAV can't hold it) to output_path. Returns
+    (input_path, source sample rate, output frames).
+    """
+    temp_path = output_path + ".part"
+    frames = 0
+    try:
+        with sf.SoundFile(input_path) as source:
+            subtype = (
+                source.subtype if sf.check_format("WAV", source.subtype) else "PCM_16"
+            )
+            with sf.SoundFile(
+                temp_path,
+                "w",
+                samplerate=target_sample_rate,
+                channels=1,
+                subtype=subtype,
+                format="WAV",
+            ) as target:
+                resampler = (
+                    Resampler(source.samplerate, target_sample_rate)
+                    if source.samplerate != target_sample_rate
+                    else None
+                )
+                weights = np.full(
+                    source.channels, 1 / source.channels, dtype=np.float32
+                )
+                for block in source.blocks(
+                    READ_FRAMES, dtype="float32", always_2d=True
+                ):
+                    # A matrix-vector product; mean(axis=1) is much slower on few columns
+                    mono = block @ weights if len(weights) > 1 else block[:, 0]
+                    out = resampler.process(mono) if resampler else mono
+                    # libsndfile does not clip out-of-range floats when converting to PCM
+                    target.write(np.clip(out, -1.0, 1.0))
+                    frames += len(out)
+                if resampler:
+                    out = resampler.flush()
+                    target.write(np.clip(out, -1.0, 1.0))
+                    frames += len(out)
+            source_rate = source.samplerate
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return input_path, source_rate, frames
+
+
+def convert_files(pairs, target_sample_rate=22050, workers=None):
+    """
+    Converts (input_path, output_path) pairs in worker processes; each worker
+    builds the filter of a rate pair once and reuses it. Yields the result
+    of every file in input order.
+    """
+    pairs = list(pairs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            convert_file,
+            [input_path for input_path, _ in pairs],
+            [output_path for _, output_path in pairs],
+            [target_sample_rate] * len(pairs),
+            chunksize=8,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert WAV files to mono at one sample rate in parallel."
+    )
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--rate", type=int, default=22050)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    pairs = []
+    for root, dirs, files in os.walk(args.input_dir):
+        for file in sorted(files):
+            if file.endswith(".wav"):
+                relative = os.path.relpath(os.path.join(root, file), args.input_dir)
+                output_path = os.path.join(args.output_dir, relative)
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                pairs.append((os.path.join(root, file), output_path))
+
+    for input_path, source_rate, frames in convert_files(
+        pairs, args.rate, args.workers
+    ):
+        print(f"{input_path}: {source_rate} Hz -> {args.rate} Hz, {frames} frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import random
+import re
+import time
+
+from text_normalizer import MERGE_FILTER, SCRIPT_LINE, TRANSCRIPT, VIETNAMESE_CHARACTERS
+
+SYLLABLES = (
+    "tôi bạn chúng ta người việt nam hôm nay trời đẹp quá đi chơi công viên "
+    "với bè học sinh trường được những một hai ba năm của và là có không"
+).split()
+
+
+# The per-function cleaners text_normalizer replaced, kept as the baseline
+def legacy_clean_text(text):
+    clean_text = re.sub(r"[^\w\s.,'!?]+", "", text)
+    clean_text = re.sub(r"\s+", " ", clean_text)
+    return clean_text.strip()
+
+
+def legacy_clean_line(line):
+    special_chars = '()"-_'
+    for char in special_chars:
+        line = line.replace(char, "")
+    line = line.replace(" ,", ",")
+    line = line.replace("  ", " ")
+    line = line.replace(";", ",")
+    line = line.replace("…", ".")
+    line = line.replace("...", ".")
+    line = line.strip(",. ;")
+    return line[:200]
+
+
+# merge_scr's filter as it was before text_normalizer, with its linear search
+# of the character list string (the same string) for every character
+vietnamese_characters = VIETNAMESE_CHARACTERS
+
+
+def is_vietnamese_char(char):
+    return char in vietnamese_characters
+
+
+def is_vietnamese_line(line):
+    count = sum(1 for char in line if is_vietnamese_char(char))
+    return count / len(line) > 0.25
+
+
+def legacy_merge_filter(line):
+    cleaned_line = line.strip()
+    if 13 <= len(cleaned_line) <= 200:
+        if not re.search(r'[-;>>*"”“…)\[\]\'’+_]', cleaned_line):
+            if is_vietnamese_line(cleaned_line):
+                return cleaned_line
+    return None
+
+
+def write_fixture(path, num_lines, seed=0):
+    # Sentences of common syllables with punctuation attached the way it is in
+    # real text: mostly commas, sometimes brackets, quotes, dashes or ellipses
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(num_lines):
+            words = [rng.choice(SYLLABLES) for _ in range(rng.randint(3, 30))]
+            for i, word in enumerate(words):
+                roll = rng.random()
+                if roll < 0.08:
+                    words[i] = word + ","
+                elif roll < 0.10:
+                    words[i] = f"({word})"
+                elif roll < 0.12:
+                    words[i] = f'"{word}"'
+                elif roll < 0.13:
+                    words[i] = word + ";"
+                elif roll < 0.14:
+                    words[i] = "-"
+                elif roll < 0.145:
+                    words[i] = word + "…"
+            separator = "  " if rng.random() < 0.05 else " "
+            ending = rng.choice([".", ".", "!", "?", "...", ""])
+            f.write(separator.join(words) + ending + "\n")
+
+
+def timed(name, func, lines):
+    start = time.perf_counter()
+    results = [func(line) for line in lines]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:7.2f} s  {len(lines) / elapsed / 1000:8.0f}k lines/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare text_normalizer with the cleaners it replaced."
+    )
+    parser.add_argument("--fixture", default="normalizer_fixture.txt")
+    parser.add_argument("--lines", type=int, default=1000000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.fixture):
+        write_fixture(args.fixture, args.lines)
+    with open(args.fixture, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()[: args.lines]
+    print(f"{len(lines)} lines from {args.fixture}")
+
+    for label, legacy, normalizer in (
+        ("clean_text", legacy_clean_text, TRANSCRIPT),
+        ("clean_line", legacy_clean_line, SCRIPT_LINE),
+        ("merge filter", legacy_merge_filter, MERGE_FILTER.clean),
+    ):
+        expected = timed(f"{label} (before)", legacy, lines)
+        results = timed(f"{label} (normalizer)", normalizer, lines)
+        differing = sum(a != b for a, b in zip(expected, results))
+        print(f"{'':<28} {differing} lines differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from pipeline import STAGES
+
+# Dependencies that take tens to hundreds of milliseconds to import
+HEAVY_MODULES = (
+    "numpy",
+    "soundfile",
+    "pydub",
+    "speech_recognition",
+    "pytube",
+    "ffmpeg",
+    "yt_dlp",
+    "requests",
+    "aiohttp",
+    "datasets",
+)
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, [
+    name for name in {heavy!r} if name in sys.modules
+]]))
+"""
+
+
+def import_time(module, repeat):
+    """
+    Median seconds to import module in a fresh interpreter, and the heavy
+    dependencies it loaded.
+    """
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    times = []
+    for _ in range(repeat):
+        # Run from the repository so its modules import from any directory
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        seconds, loaded = json.loads(output.splitlines()[-1])
+        times.append(seconds)
+    return statistics.median(times), loaded
+
+
+def help_time(stage, repeat):
+    # Median wall time of `pipeline.py STAGE --help`, interpreter start included
+    pipeline = os.path.join(REPO_DIR, "pipeline.py")
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, pipeline, stage, "--help"],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the import and --help time of each pipeline stage."
+    )
+    parser.add_argument("stages", nargs="*", help="Default: every stage")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'stage':<18} {'import':>8} {'--help':>8}  heavy modules loaded")
+    for stage in args.stages or STAGES:
+        module = STAGES[stage][0]
+        try:
+            seconds, loaded = import_time(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{stage:<18} failed to import {module}: {e.stderr.strip()}")
+            continue
+        wall = help_time(stage, args.repeat)
+        print(
+            f"{stage:<18} {seconds * 1000:6.0f}ms {wall * 1000:6.0f}ms  "
+            f"{', '.join(loaded) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
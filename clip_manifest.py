@@ -0,0 +1,222 @@
+import os
+import time
+
+import numpy as np
+
+from sidecar import replacing, sidecar_path
+
+MANIFEST_SUFFIX = ".manifest.npz"
+# A directory modified this recently may still change within the same mtime
+# tick, so it is scanned again next time instead of trusted
+MTIME_SETTLE_NS = 2 * 10**9
+COLUMNS = ("names", "numbers", "voices", "text_lengths", "sizes", "mtimes")
+
+
+def manifest_path(directory):
+    return sidecar_path(directory, MANIFEST_SUFFIX)
+
+
+def parse_clip_name(name):
+    """
+    (number, voice tag, text length) of audio_{number}_{voice tag}_{length}.wav.
+    Names without the tag or the length give "" or -1 for them.
+    """
+    parts = name[: -len(".wav")].split("_")
+    number = int(parts[1])
+    if number < 0:
+        raise ValueError(f"Negative clip number in {name}")
+    if len(parts) >= 4 and parts[-1].isdigit():
+        return number, "_".join(parts[2:-1]), int(parts[-1])
+    return number, "_".join(parts[2:]), -1
+
+
+def scan_directory(path):
+    # Clip columns and subdirectories of one directory, without recursing
+    records, subdirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append(os.path.normpath(entry.path))
+            elif entry.name.startswith("audio_") and entry.name.endswith(".wav"):
+                try:
+                    number, voice, text_length = parse_clip_name(entry.name)
+                except (ValueError, IndexError):
+                    continue
+                stat = entry.stat()
+                records.append(
+                    (
+                        entry.name,
+                        number,
+                        voice,
+                        text_length,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+    names, numbers, voices, text_lengths, sizes, mtimes = (
+        zip(*records) if records else ((),) * 6
+    )
+    columns = {
+        "names": np.array(names, dtype=str),
+        "numbers": np.array(numbers, dtype=np.int64),
+        "voices": np.array(voices, dtype=str),
+        "text_lengths": np.array(text_lengths, dtype=np.int32),
+        "sizes": np.array(sizes, dtype=np.int64),
+        "mtimes": np.array(mtimes, dtype=np.int64),
+    }
+    return columns, sorted(subdirs)
+
+
+def read_cache(path):
+    # {directory: (mtime_ns, columns, subdirectories)} as saved by write_cache
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    if any(key not in arrays for key in COLUMNS):
+        return {}  # Written by an older version; scan everything again
+    directories = arrays["directories"].tolist()
+    bounds = np.concatenate(([0], np.cumsum(arrays["counts"]))).tolist()
+    subdirs = {directory: [] for directory in directories}
+    for directory, parent in zip(directories, arrays["parents"].tolist()):
+        if parent >= 0:
+            subdirs[directories[parent]].append(directory)
+    cache = {}
+    for i, directory in enumerate(directories):
+        columns = {key: arrays[key][bounds[i] : bounds[i + 1]] for key in COLUMNS}
+        cache[directory] = (
+            int(arrays["directory_mtimes"][i]),
+            columns,
+            subdirs[directory],
+        )
+    return cache
+
+
+def write_cache(path, groups):
+    directories = list(groups)
+    position = {directory: i for i, directory in enumerate(directories)}
+    parents = np.full(len(directories), -1, dtype=np.int64)
+    for directory, (_, _, subdirs) in groups.items():
+        for subdir in subdirs:
+            parents[position[subdir]] = position[directory]
+    arrays = {
+        key: np.concatenate([columns[key] for _, columns, _ in groups.values()])
+        for key in COLUMNS
+    }
+    with replacing(path, ".npz") as temp_path:
+        np.savez(
+            temp_path,
+            directories=np.array(directories, dtype=str),
+            directory_mtimes=np.array(
+                [mtime for mtime, _, _ in groups.values()], dtype=np.int64
+            ),
+            counts=np.array(
+                [len(columns["numbers"]) for _, columns, _ in groups.values()],
+                dtype=np.int64,
+            ),
+            parents=parents,
+            **arrays,
+        )
+
+
+class ClipManifest:
+    """
+    The audio_*.wav clips of a directory tree, parsed once into parallel
+    arrays sorted by clip number: numbers, voice_ids into voices, text_lengths
+    (-1 if the name has none), sizes in bytes, mtimes in ns, and the
+    directory and name that make up each path.
+    """
+
+    def __init__(self, groups):
+        directories = list(groups)
+        columns = {
+            key: np.concatenate([columns[key] for _, columns, _ in groups.values()])
+            for key in COLUMNS
+        }
+        directory_ids = np.repeat(
+            np.arange(len(directories), dtype=np.int32),
+            [len(columns["numbers"]) for _, columns, _ in groups.values()],
+        )
+        # Stable, so clips sharing a number keep their scan order
+        order = np.argsort(columns["numbers"], kind="stable")
+        self.directories = directories
+        self.directory_ids = directory_ids[order]
+        self.names = columns["names"][order]
+        self.numbers = columns["numbers"][order]
+        voices, voice_ids = np.unique(columns["voices"][order], return_inverse=True)
+        self.voices = voices.tolist()
+        self.voice_ids = voice_ids.astype(np.int16)
+        self.text_lengths = columns["text_lengths"][order]
+        self.sizes = columns["sizes"][order]
+        self.mtimes = columns["mtimes"][order]
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def path(self, i):
+        return os.path.join(self.directories[self.directory_ids[i]], self.names[i])
+
+    @property
+    def paths(self):
+        return [
+            os.path.join(self.directories[directory_id], name)
+            for directory_id, name in zip(
+                self.directory_ids.tolist(), self.names.tolist()
+            )
+        ]
+
+    def max_number(self):
+        return int(self.numbers[-1]) if len(self.numbers) else 0
+
+    def missing_numbers(self, max_number=None, mask=None):
+        """
+        Gaps in 1..max_number (default the highest clip number), via a bitmap.
+        With a boolean mask only the clips it selects count as present.
+        """
+        max_number = self.max_number() if max_number is None else max_number
+        numbers = self.numbers if mask is None else self.numbers[mask]
+        present = np.zeros(max_number + 1, dtype=bool)
+        present[numbers[numbers <= max_number]] = True
+        present[0] = True
+        return np.flatnonzero(~present)
+
+    def last_per_number(self, mask=None):
+        # Positions of the last (selected) clip of each number, in number order
+        positions = (
+            np.arange(len(self.numbers)) if mask is None else np.flatnonzero(mask)
+        )
+        numbers = self.numbers[positions]
+        if not len(numbers):
+            return positions
+        return positions[np.append(np.diff(numbers) != 0, True)]
+
+
+def load_manifest(directory, use_cache=True):
+    """
+    Manifest of the clips under directory. Directories whose mtime matches
+    the cached one (saved as <directory>.manifest.npz) are not listed again;
+    adding, removing or renaming clips changes the mtime of their directory,
+    but rewriting a clip in place does not, so its cached size can go stale.
+    """
+    cached_path = manifest_path(directory)
+    cache = read_cache(cached_path) if use_cache and os.path.exists(cached_path) else {}
+    now = time.time_ns()
+    groups = {}
+    rescanned = False
+    stack = [os.path.normpath(directory)]
+    while stack:
+        path = stack.pop()
+        mtime = os.stat(path).st_mtime_ns
+        cached = cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            _, columns, subdirs = cached
+        else:
+            columns, subdirs = scan_directory(path)
+            rescanned = True
+        if now - mtime < MTIME_SETTLE_NS:
+            mtime = -1
+        groups[path] = (mtime, columns, subdirs)
+        stack.extend(subdirs)
+
+    # Nothing to save unless a directory was listed again or went away
+    if use_cache and (rescanned or set(groups) != set(cache)):
+        write_cache(cached_path, groups)
+    return ClipManifest(groups)
@@ -0,0 +1,177 @@
+import heapq
+from array import array
+
+import numpy as np
+
+from vocab_stats import tokenize, toned_vowels
+
+# Syllables matter most; bigrams approximate word and transition coverage and
+# toned vowel graphemes stand in for phoneme coverage
+DEFAULT_WEIGHTS = {"syllable": 1.0, "bigram": 0.5, "grapheme": 2.0}
+# Heap entries re-scored together once the top one turns out to be stale
+RESCORE_BATCH = 64
+INITIAL_CHUNK = 1 << 16
+
+
+def syllable_features(syllable):
+    # The syllable itself first, then its toned vowel graphemes
+    return [("syllable", syllable)] + [
+        ("grapheme", grapheme) for grapheme in toned_vowels(syllable)
+    ]
+
+
+class CoverageSelector:
+    """
+    Greedy budgeted max-coverage over sentences: repeatedly picks the
+    sentence with the most not-yet-covered feature weight per character.
+    Gains only shrink as features get covered, so a stale gain on the heap is
+    an upper bound and only the top entries need recomputing (lazy greedy),
+    which is done for a batch of them at a time with numpy.
+    Feature ids are kept in one flat int32 array to scale to millions of
+    candidates.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.feature_ids = {}
+        self.syllable_ids = {}
+        self.feature_weights = array("d")
+        self.features = array("i")
+        self.starts = array("q", [0])
+        self.costs = array("q")
+        self.keys = []
+        self.buckets = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def feature_id(self, feature):
+        feature_id = self.feature_ids.get(feature)
+        if feature_id is None:
+            feature_id = self.feature_ids[feature] = len(self.feature_weights)
+            self.feature_weights.append(self.weights[feature[0]])
+        return feature_id
+
+    def add(self, key, text, bucket=None):
+        # key identifies the sentence in the result; cost is its output length
+        ids = set()
+        previous = None
+        for syllable in tokenize(text):
+            syllable_ids = self.syllable_ids.get(syllable)
+            if syllable_ids is None:
+                syllable_ids = self.syllable_ids[syllable] = tuple(
+                    self.feature_id(feature) for feature in syllable_features(syllable)
+                )
+            ids.update(syllable_ids)
+            if previous is not None:
+                ids.add(self.feature_id(("bigram", previous, syllable_ids[0])))
+            previous = syllable_ids[0]
+        self.features.extend(ids)
+        self.starts.append(len(self.features))
+        self.costs.append(len(text) + 1)
+        self.keys.append(key)
+        self.buckets.append(bucket)
+
+    def select(self, max_chars, bucket_shares=None, seed=0):
+        """
+        Keys of the chosen sentences in selection order. bucket_shares maps a
+        bucket to its share of max_chars, e.g. {"medium": 0.7, "other": 0.3}.
+        Once no sentence adds coverage, the rest of each bucket's share is
+        filled with its remaining sentences in random order, then the rest of
+        max_chars with those of any bucket.
+        """
+        weights = np.frombuffer(self.feature_weights, dtype=np.float64)
+        features = np.frombuffer(self.features, dtype=np.int32)
+        starts = np.frombuffer(self.starts, dtype=np.int64)
+        costs = np.frombuffer(self.costs, dtype=np.int64)
+        covered = np.zeros(len(weights), dtype=bool)
+        budgets = {
+            bucket: share * max_chars for bucket, share in (bucket_shares or {}).items()
+        }
+        used = 0
+
+        def current_gains(indices):
+            # Uncovered feature weight per character of each sentence, in one go
+            lengths = starts[indices + 1] - starts[indices]
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            positions = np.arange(lengths.sum()) + np.repeat(
+                starts[indices] - offsets, lengths
+            )
+            ids = features[positions]
+            uncovered = np.where(covered[ids], 0.0, weights[ids])
+            return np.add.reduceat(uncovered, offsets) / costs[indices]
+
+        # Initial gains in chunks to bound memory; empty sentences never enter
+        present = np.flatnonzero(np.diff(starts))
+        heap = []
+        for chunk in range(0, len(present), INITIAL_CHUNK):
+            indices = present[chunk : chunk + INITIAL_CHUNK]
+            gains = current_gains(indices)
+            heap.extend(zip((-gains).tolist(), indices.tolist()))
+        heapq.heapify(heap)
+
+        def fits(i):
+            bucket = self.buckets[i]
+            if used + costs[i] > max_chars:
+                return False
+            return bucket not in budgets or costs[i] <= budgets[bucket]
+
+        selected = []
+        chosen_mask = np.zeros(len(costs), dtype=bool)
+        shortest = int(costs.min()) if len(costs) else 0
+        while heap and max_chars - used >= shortest:
+            # Budgets only shrink, so a sentence that doesn't fit never will
+            batch = []
+            while heap and len(batch) < RESCORE_BATCH:
+                i = heapq.heappop(heap)[1]
+                if fits(i):
+                    batch.append(i)
+            if not batch:
+                break
+            indices = np.array(batch)
+            gains = current_gains(indices)
+            best = int(np.argmax(gains))
+
+            # Stale gains left on the heap are upper bounds of their real ones
+            chosen = None
+            if gains[best] > 0 and (not heap or gains[best] >= -heap[0][0]):
+                chosen = batch[best]
+                ids = features[starts[chosen] : starts[chosen + 1]]
+                covered[ids] = True
+                chosen_mask[chosen] = True
+                used += int(costs[chosen])
+                bucket = self.buckets[chosen]
+                if bucket in budgets:
+                    budgets[bucket] -= costs[chosen]
+                selected.append(self.keys[chosen])
+            for i, gain in zip(batch, gains.tolist()):
+                if i != chosen and gain > 0:
+                    heapq.heappush(heap, (-gain, i))
+
+        # Coverage is saturated or out of candidates; spend what is left
+        order = np.random.default_rng(seed).permutation(present).tolist()
+        for use_shares in (True, False):
+            if not use_shares:
+                budgets = {}
+            for i in order:
+                if max_chars - used < shortest:
+                    break
+                if not chosen_mask[i] and fits(i):
+                    chosen_mask[i] = True
+                    used += int(costs[i])
+                    bucket = self.buckets[i]
+                    if bucket in budgets:
+                        budgets[bucket] -= costs[i]
+                    selected.append(self.keys[i])
+        return selected
+
+    def coverage(self, keys=None):
+        # Share of feature weight covered by the given (default: all) sentences
+        weights = np.frombuffer(self.feature_weights, dtype=np.float64)
+        features = np.frombuffer(self.features, dtype=np.int32)
+        covered = np.zeros(len(weights), dtype=bool)
+        chosen = set(keys) if keys is not None else None
+        for i, key in enumerate(self.keys):
+            if chosen is None or key in chosen:
+                covered[features[self.starts[i] : self.starts[i + 1]]] = True
+        return weights[covered].sum() / weights.sum() if len(weights) else 0.0
@@ -1,44 +1,34 @@
-import os
+import numpy as np
 
-
-def extract_number(file_name):
-    """
-    Extract the number from the filename assuming the format 'audio_{number}_...'.
-    """
-    base_name = os.path.basename(file_name)
-    number_part = base_name.split("_")[1]
-    return int(number_part)
+from audio_qc import qc_path, run_qc
+from clip_manifest import load_manifest
 
 
 def find_wav_files(directory_path):
     """
-    Walk through the directory, collect all .wav files, and sort them by the numerical value after 'audio_'.
+    Manifest of the .wav files under the directory, sorted by the numerical value after 'audio_'.
+    Only directories that changed since the last run are listed again.
     """
-    wav_files = []
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            if file.endswith(".wav"):
-                wav_files.append(os.path.join(root, file))
-    wav_files.sort(key=extract_number)
-    return wav_files
+    manifest = load_manifest(directory_path)
+    print(f"Clips found: {len(manifest)}")
+    return manifest
 
 
-def find_max_number(wav_files):
+def check_wav_files(directory_path, manifest):
     """
-    Find the maximum number among the .wav filenames.
+    Run the audio QC on every clip, reusing the cached results of unchanged clips.
     """
-    max_number = max(extract_number(file) for file in wav_files)
-    return max_number
+    qc_table = run_qc(manifest, qc_path(directory_path))
+    print("QC results:", dict(qc_table.summary()))
+    return qc_table
 
 
-def find_missing_numbers(wav_files, max_number):
+def find_missing_numbers(manifest, max_number=None, passed=None):
     """
-    Identify missing numbers in the sequence up to max_number.
+    Identify missing numbers in the sequence up to max_number (default the highest clip number).
+    With a QC pass mask, numbers whose clips all failed count as missing.
     """
-    existing_numbers = {extract_number(file) for file in wav_files}
-    all_numbers = set(range(1, max_number + 1))
-    missing_numbers = sorted(all_numbers - existing_numbers)
-    return missing_numbers
+    return manifest.missing_numbers(max_number, passed).tolist()
 
 
 def write_missing_numbers(missing_numbers, file_path):
@@ -51,6 +41,17 @@ def write_missing_numbers(missing_numbers, file_path):
     print(f"Missing numbers written to {file_path}")
 
 
+def write_qc_failures(manifest, qc_table, file_path):
+    """
+    Write the clips that failed QC and why to a file.
+    """
+    failed = np.flatnonzero(~qc_table.passed).tolist()
+    with open(file_path, "w", encoding="utf-8") as f:
+        for i in failed:
+            f.write(f"{manifest.path(i)}\t{qc_table.reason(i)}\n")
+    print(f"{len(failed)} clips failing QC written to {file_path}")
+
+
 def load_transcriptions(file_path):
     """
     Load all transcriptions from a file.
@@ -61,28 +62,23 @@ def load_transcriptions(file_path):
     return transcriptions
 
 
-def filter_transcriptions(transcriptions, wav_files):
+def filter_transcriptions(transcriptions, manifest, passed=None):
     """
-    Filter the transcriptions to only include those for which the corresponding .wav file exists.
-    Assumes transcriptions are sorted and aligned with the sorted .wav file list.
+    Filter the transcriptions to only include those for which the corresponding .wav file exists
+    and, given a QC pass mask, passed QC.
+    Line n of the transcriptions (1-indexed) belongs to clip number n.
     Adds full path before each transcription.
     """
     filtered_transcriptions = []
-    wav_file_numbers = sorted({extract_number(file) for file in wav_files})
-    wav_files_dict = {
-        extract_number(file): file for file in wav_files
-    }  # Dictionary to map number to file path
-
-    for number in wav_file_numbers:
-        try:
-            # Get the full path from the wav_files_dict
-            full_path = wav_files_dict[number]
-            # Assume the transcriptions are in a 1-indexed file format matching the .wav files
-            transcription_line = f"{full_path}|{transcriptions[number-1].strip()}\n"
-            filtered_transcriptions.append(transcription_line)
-        except IndexError:
+    # The last clip of each number wins if there are several
+    last = manifest.last_per_number(passed)
+    paths = manifest.paths
+    for i, number in zip(last.tolist(), manifest.numbers[last].tolist()):
+        if number > len(transcriptions) or number < 1:
             print(f"Index error with number: {number}, possible missing transcription.")
             continue
+        transcription_line = f"{paths[i]}|{transcriptions[number-1].strip()}\n"
+        filtered_transcriptions.append(transcription_line)
 
     return filtered_transcriptions
 
@@ -108,13 +104,16 @@ def main():
     transcription_file_path = "src/vi_universal_3.txt"
     output_file_path = "src/filtered_vi_universal_3.txt"
 
-    wav_files = find_wav_files(directory_path)
-    max_number = find_max_number(wav_files)
-    missing_numbers = find_missing_numbers(wav_files, max_number)
+    manifest = find_wav_files(directory_path)
+    qc_table = check_wav_files(directory_path, manifest)
+    write_qc_failures(manifest, qc_table, "src/universal_qc_failed_3.txt")
+    missing_numbers = find_missing_numbers(manifest, passed=qc_table.passed)
     write_missing_numbers(missing_numbers, "src/universal_missing_3.txt")
 
     all_transcriptions = load_transcriptions(transcription_file_path)
-    filtered_transcriptions = filter_transcriptions(all_transcriptions, wav_files)
+    filtered_transcriptions = filter_transcriptions(
+        all_transcriptions, manifest, qc_table.passed
+    )
     write_transcriptions(filtered_transcriptions, output_file_path)
 
 
@@ -1,11 +1,13 @@
-from datasets import load_dataset
-import nltk
-from nltk.tokenize import word_tokenize
+import heapq
 import random
 import re
+from glob import glob
 
-# Ensure you have the NLTK tokenizer resources
-nltk.download("punkt")
+from coverage_selector import CoverageSelector
+from dedup_index import DedupIndex, line_hash
+from line_sampler import LineReader
+from text_normalizer import SCRIPT_LINE
+from vocab_stats import count_vocabulary
 
 
 def save_vietnamese_text(dataset, output_file):
@@ -16,71 +18,98 @@ def save_vietnamese_text(dataset, output_file):
 
 
 def count_unique_words(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        text = file.read()
-    tokens = word_tokenize(text)
-    unique_tokens = set(tokens)
+    # Same syllable tokenizer as merge_scr.count_unique_words, counted in parallel
+    # and cached next to the file
+    unique_tokens = set(count_vocabulary(file_path))
     return len(unique_tokens), unique_tokens
 
 
 def clean_line(line):
-    # Remove special characters
-    special_chars = '()"-_'
-    for char in special_chars:
-        line = line.replace(char, "")
-
-    # Fix spacing around commas
-    line = line.replace(" ,", ",")
-    line = line.replace("  ", " ")
-    line = line.replace(";", ",")
-    line = line.replace("…", ".")
-    line = line.replace("...", ".")
-
-    # Trim periods from the beginning or the end of the line and excess spaces
-    line = line.strip(",. ;")
-
-    # Ensure the line does not exceed 200 characters
-    return line[:200]
-
-
-def generate_random_text(input_path1, input_path2, output_path, max_chars=1000000):
-    # Read all lines from the first file
-    with open(input_path1, "r", encoding="utf-8") as file:
-        lines1 = file.readlines()
-
-    # Read all lines from the second file
-    with open(input_path2, "r", encoding="utf-8") as file:
-        lines2 = set(file.readlines())
-
-    # Define a regular expression pattern for Vietnamese text and specific punctuation
-    pattern = re.compile(
-        r'^[a-zA-Zàáảãạăắằẳẵặâầấẩẫậđèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵ\s,\.?!;%"…()_-]+$'
-    )
-
-    # Filter lines based on character length, pattern, and non-appearance in input_path2
-    short_lines = [
-        line.strip()
-        for line in lines1
-        if 18 <= len(line.strip()) <= 45 and pattern.match(line) and line not in lines2
-    ]
-    medium_lines = [
-        line.strip()
-        for line in lines1
-        if 45 < len(line.strip()) <= 145 and pattern.match(line) and line not in lines2
-    ]
-    long_lines = [
-        line.strip()
-        for line in lines1
-        if 145 < len(line.strip()) <= 180 and pattern.match(line) and line not in lines2
-    ]
-
-    # Adjust the proportions
-    random.shuffle(medium_lines)
-    random.shuffle(short_lines)
-    random.shuffle(long_lines)
+    # Drop brackets, quotes and dashes, normalize commas, ellipses and spacing,
+    # trim leading and trailing punctuation and cap the length at 200
+    return SCRIPT_LINE.normalize(line)
+
+
+class Reservoir:
+    """
+    Uniform random sample of a stream in random order, sized by the items
+    themselves: every item gets a random key, and the items with the smallest
+    keys are kept until their sizes add up to at least budget. Whatever prefix
+    of that order fits in budget is then always there.
+    """
+
+    def __init__(self, budget, rng=random):
+        self.budget = budget
+        self.rng = rng
+        self.heap = []  # (-key, arrival, item, size): largest key on top
+        self.size = 0
+        self.seen = 0
+
+    def add(self, item, size):
+        key = self.rng.random()
+        self.seen += 1
+        if self.heap and self.size >= self.budget and key > -self.heap[0][0]:
+            return
+        heapq.heappush(self.heap, (-key, self.seen, item, size))
+        self.size += size
+        while self.heap and self.size - self.heap[0][3] >= self.budget:
+            self.size -= heapq.heappop(self.heap)[3]
+
+    def ordered(self):
+        # Items in random order, last first, ready for list.pop()
+        return [item for _, _, item, _ in sorted(self.heap)]
+
+
+# Vietnamese text and specific punctuation only
+CANDIDATE_PATTERN = re.compile(
+    r'^[a-zA-Zàáảãạăắằẳẵặâầấẩẫậđèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵ\s,\.?!;%"…()_-]+$'
+)
+
+
+def candidate_lines(input_path1, input_path2):
+    """
+    Yields (line number, stripped line, is_medium) for every line of
+    input_path1 that is 18-180 characters of Vietnamese text and does not
+    appear in the earlier set(s) in input_path2, a path or a list of paths.
+    """
+    prior_paths = [input_path2] if isinstance(input_path2, str) else input_path2
+    # One index per earlier set, built once and memory-mapped on later runs
+    excluded = [DedupIndex.for_file(path) for path in prior_paths]
+
+    # Only "\n" ends a line, so line numbers match line_sampler's index
+    with open(input_path1, "r", encoding="utf-8", newline="\n") as file:
+        for number, line in enumerate(file):
+            stripped = line.strip()
+            length = len(stripped)
+            if length < 18 or length > 180:
+                continue
+            if not CANDIDATE_PATTERN.match(line):
+                continue
+            h = line_hash(stripped)
+            if any(index.contains_hash(h) for index in excluded):
+                continue
+            yield number, stripped, 45 < length <= 145
+
+
+def generate_random_text(
+    input_path1, input_path2, output_path, max_chars=1000000, seed=None
+):
+    rng = random.Random(seed)
+
+    # Lines are sampled cleaned, as they are written; no bucket can supply more
+    # than max_chars of output, so that is all each sample has to hold
+    medium_lines = Reservoir(max_chars, rng)
+    other_lines = Reservoir(max_chars, rng)  # Short and long lines together
+
+    # Single pass over the corpus: filter, clean, classify by length, sample
+    for _, line, is_medium in candidate_lines(input_path1, input_path2):
+        clean_and_trimmed_line = clean_line(line)
+        if clean_and_trimmed_line:
+            bucket = medium_lines if is_medium else other_lines
+            bucket.add(clean_and_trimmed_line, len(clean_and_trimmed_line) + 1)
 
     # Determine the total number of lines desired, assuming a maximum number available
-    total_available_lines = len(medium_lines) + len(short_lines) + len(long_lines)
+    total_available_lines = medium_lines.seen + other_lines.seen
     target_proportion = 0.7
 
     # Calculate numbers for target and other lines to achieve the desired proportion
@@ -88,36 +117,70 @@ def generate_random_text(input_path1, input_path2, output_path, max_chars=100000
     num_other = total_available_lines - num_target  # Remaining lines
 
     # Ensure we don't request more target lines than available
-    num_target = min(num_target, len(medium_lines))
-    num_other = min(num_other, len(short_lines) + len(long_lines))
-
-    # Assemble the final list of lines
-    total_lines = medium_lines[:num_target] + random.sample(
-        short_lines + long_lines, num_other
-    )
-
-    # Shuffle the combined list to randomize the selection process
-    random.shuffle(total_lines)
-
-    # Initialize output text and process the shuffled lines
-    output_text = ""
-    for line in total_lines:
+    num_target = min(num_target, medium_lines.seen)
+    num_other = min(num_other, other_lines.seen)
+
+    # Drawing a medium line with probability num_target / (num_target + num_other)
+    # each step reads the same prefix as shuffling all chosen lines together
+    medium_items = medium_lines.ordered()
+    other_items = other_lines.ordered()
+    output_chars = 0
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        while num_target + num_other:
+            if rng.randrange(num_target + num_other) < num_target:
+                bucket = medium_items
+                num_target = num_target - 1 if bucket else 0
+            else:
+                bucket = other_items
+                num_other = num_other - 1 if bucket else 0
+            if not bucket:
+                continue  # Used up; the other bucket may still have lines
+            clean_and_trimmed_line = bucket.pop()
+            if output_chars + len(clean_and_trimmed_line) > max_chars:
+                break
+            output_file.write(clean_and_trimmed_line + "\n")
+            output_chars += len(clean_and_trimmed_line) + 1
+
+
+def select_covering_text(
+    input_path1, input_path2, output_path, max_chars=1000000, target_proportion=0.7
+):
+    """
+    Like generate_random_text, but instead of sampling at random picks the
+    sentences that add the most new syllables, syllable pairs and toned vowels
+    per character, then random ones once nothing new is left, until max_chars
+    is spent. Medium lines get target_proportion of the characters, short and
+    long lines the rest.
+    """
+    selector = CoverageSelector()
+    for number, line, is_medium in candidate_lines(input_path1, input_path2):
         clean_and_trimmed_line = clean_line(line)
         if clean_and_trimmed_line:
-            if len(output_text) + len(clean_and_trimmed_line) > max_chars:
-                break
-            output_text += clean_and_trimmed_line + "\n"
+            selector.add(
+                number, clean_and_trimmed_line, "medium" if is_medium else "other"
+            )
 
-    # Write the output text to a new file
-    with open(output_path, "w", encoding="utf-8") as output_file:
-        output_file.write(output_text)
+    selected = selector.select(
+        max_chars, {"medium": target_proportion, "other": 1 - target_proportion}
+    )
+    print(
+        f"Selected {len(selected)} of {len(selector)} candidate lines, "
+        f"covering {selector.coverage(selected):.1%} of their feature weight"
+    )
 
+    # Only line numbers were kept; read the chosen lines back by seeking
+    with LineReader(input_path1) as reader, open(
+        output_path, "w", encoding="utf-8"
+    ) as output_file:
+        for number in selected:
+            output_file.write(clean_line(reader.line(number).strip()) + "\n")
+    return selected
 
-def main():
-    # Specify the output file path
-    output_file_path = "all_vietnamese_texts.txt"
 
+def main():
     # Save the Vietnamese texts
+    # output_file_path = "all_vietnamese_texts.txt"
+    # from datasets import load_dataset  # Slow to import, and not needed below
     # save_vietnamese_text(load_dataset("Eugenememe/mix-en-vi-4m"), output_file_path)
 
     # Count unique words and print them
@@ -125,11 +188,13 @@ def main():
     # print(f"Total unique words: {unique_word_count}")  # 800k unique words
 
     # Call the function to generate the file
-    generate_random_text(
-        "src/all_vietnamese_texts.txt",
-        "src/vi_universal_2m.txt",
-        "src/vi_universal_1m_plus.txt",
-    )
+    # Skip every sentence already used in an earlier vi_universal set
+    output_path = "src/vi_universal_1m_plus.txt"
+    prior_sets = [
+        path for path in sorted(glob("src/vi_universal_*.txt")) if path != output_path
+    ]
+    # Coverage-driven selection; generate_random_text picks at random instead
+    select_covering_text("src/all_vietnamese_texts.txt", prior_sets, output_path)
 
     unique_word_count, unique_words = count_unique_words("src/vi_universal_1m_plus.txt")
     print(f"Total unique words: {unique_word_count}")  # 14k unique words
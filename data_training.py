@@ -1,35 +1,31 @@
-import random
+import argparse
 
+from line_sampler import split_lines
 
-# Function to read data from a file
-def read_data(filename):
-    with open(filename, "r", encoding="utf-8") as file:
-        lines = file.readlines()
-    return lines
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Shuffle the filtered sentences into training and validation sets."
+    )
+    parser.add_argument("--input", default="src/filtered_vi_universal_3.txt")
+    parser.add_argument("--train", default="output/train.txt")
+    parser.add_argument("--val", default="output/val.txt")
+    parser.add_argument("--train-fraction", type=float, default=0.85)
+    args = parser.parse_args()
 
-# Function to write data to a file
-def write_data(filename, lines):
-    with open(filename, "w", encoding="utf-8") as file:
-        file.writelines(lines)
+    # Shuffle and split the data into training and validation sets (85% train, 15% val)
+    # without reading the whole file into memory
+    train_count, val_count = split_lines(
+        args.input,
+        args.train,
+        args.val,
+        train_fraction=args.train_fraction,
+    )
 
+    print(
+        f"Data has been split and saved successfully ({train_count} train, {val_count} val)."
+    )
 
-# Read data from files
-data1 = read_data("src/filtered_vi_universal_3.txt")
-# data2 = read_data("src/filtered_vi_universal_1m.txt")
 
-# Combine and shuffle the data
-# combined_data = data1 + data2
-combined_data = data1
-random.shuffle(combined_data)
-
-# Split data into training and validation sets (85% train, 15% val)
-split_index = int(0.85 * len(combined_data))
-train_data = combined_data[:split_index]
-val_data = combined_data[split_index:]
-
-# Write the split data to files
-write_data("output/train.txt", train_data)
-write_data("output/val.txt", val_data)
-
-print("Data has been split and saved successfully.")
+if __name__ == "__main__":
+    main()
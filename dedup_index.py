@@ -0,0 +1,189 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+from sidecar import is_fresh, replacing, sidecar_path
+
+INDEX_SUFFIX = ".dedup.idx"
+# Version 2 hashes stripped lines; version 1 hashed a normalized form
+MAGIC = b"DEDUPIX2"
+# magic, table capacity, entry count, Bloom filter words, Bloom bits per line
+HEADER = struct.Struct("=8sQQQQ")
+MAX_LOAD = 0.7
+BLOOM_BITS_PER_ITEM = 10
+BLOOM_HASHES = 4
+
+
+def line_hash(line):
+    # Lines are the same when they are equal once stripped, as in a set of them
+    digest = hashlib.blake2b(line.strip().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1  # 0 marks an empty slot
+
+
+class DedupIndex:
+    """
+    Set of lines stored as 64-bit hashes of their stripped text in an
+    open-addressing table (linear probing), about 11 bytes per line instead of
+    a full Python string. An optional blocked Bloom filter sized for
+    bloom_items (4 bits inside one 64-bit word per line) answers most lookups
+    of new lines without touching the table, which matters once the table is
+    memory-mapped from disk.
+    """
+
+    def __init__(self, capacity=1 << 16, bloom_items=0):
+        capacity = 1 << max(capacity - 1, 1).bit_length()
+        self.table = array("Q", [0]) * capacity
+        self.mask = capacity - 1
+        self.count = 0
+        self.bloom = None
+        if bloom_items:
+            words = max(bloom_items * BLOOM_BITS_PER_ITEM // 64, 1)
+            self.bloom = array("Q", [0]) * (1 << (words - 1).bit_length())
+            self.bloom_mask = len(self.bloom) - 1
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, line):
+        return self.contains_hash(line_hash(line))
+
+    def add(self, line):
+        # True if the line was not in the index yet
+        return self.add_hash(line_hash(line))
+
+    @staticmethod
+    def _bloom_bits(h):
+        return (
+            (1 << (h & 63))
+            | (1 << ((h >> 6) & 63))
+            | (1 << ((h >> 12) & 63))
+            | (1 << ((h >> 18) & 63))
+        )
+
+    def contains_hash(self, h):
+        if self.bloom is not None:
+            bits = self._bloom_bits(h)
+            if self.bloom[(h >> 32) & self.bloom_mask] & bits != bits:
+                return False
+        table, mask = self.table, self.mask
+        slot = h & mask
+        while True:
+            value = table[slot]
+            if value == h:
+                return True
+            if value == 0:
+                return False
+            slot = (slot + 1) & mask
+
+    def add_hash(self, h):
+        if self.contains_hash(h):
+            return False
+        if (self.count + 1) > MAX_LOAD * (self.mask + 1):
+            self._grow()
+        self._insert(h)
+        self.count += 1
+        if self.bloom is not None:
+            self.bloom[(h >> 32) & self.bloom_mask] |= self._bloom_bits(h)
+        return True
+
+    def _insert(self, h):
+        table, mask = self.table, self.mask
+        slot = h & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = h
+
+    def _grow(self):
+        old_table = self.table
+        self.table = array("Q", [0]) * ((self.mask + 1) * 2)
+        self.mask = len(self.table) - 1
+        for h in old_table:
+            if h:
+                self._insert(h)
+
+    @property
+    def nbytes(self):
+        return (
+            len(self.table) + (len(self.bloom) if self.bloom is not None else 0)
+        ) * 8
+
+    def add_file(self, path):
+        # Returns the number of new lines
+        added = 0
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    added += self.add(line)
+        return added
+
+    @classmethod
+    def from_files(cls, paths, bloom=False):
+        # Rough line count from the file sizes, so the table rarely has to grow
+        estimate = max(sum(os.path.getsize(path) for path in paths) // 40, 1024)
+        index = cls(int(estimate / MAX_LOAD), estimate if bloom else 0)
+        for path in paths:
+            index.add_file(path)
+        return index
+
+    @classmethod
+    def for_file(cls, path, use_cache=True):
+        """
+        Index of the lines of one file, with a Bloom filter. It is saved next
+        to the file as <path>.dedup.idx and memory-mapped from there until the
+        file changes.
+        """
+        cached = sidecar_path(path, INDEX_SUFFIX)
+        if use_cache and is_fresh(cached, path):
+            try:
+                return cls.load(cached)
+            except ValueError:
+                pass  # Written by an older version; build it again
+        index = cls.from_files([path], bloom=True)
+        if use_cache:
+            index.save(cached)
+        return index
+
+    def save(self, path):
+        with replacing(path) as temp_path, open(temp_path, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    len(self.table),
+                    self.count,
+                    len(self.bloom) if self.bloom is not None else 0,
+                    BLOOM_HASHES,
+                )
+            )
+            f.write(memoryview(self.table).cast("B"))
+            if self.bloom is not None:
+                f.write(memoryview(self.bloom).cast("B"))
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """
+        Opens an index written by save(). With use_mmap the table is paged in
+        from disk on demand; additions go to a private copy-on-write mapping
+        and never change the file.
+        """
+        with open(path, "rb") as f:
+            if use_mmap:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            else:
+                buffer = bytearray(f.read())
+        magic, capacity, count, bloom_words, bloom_hashes = HEADER.unpack_from(buffer)
+        if magic != MAGIC or bloom_hashes != BLOOM_HASHES:
+            raise ValueError(f"{path} is not a dedup index")
+
+        view = memoryview(buffer)
+        table_end = HEADER.size + capacity * 8
+        index = cls.__new__(cls)
+        index.table = view[HEADER.size : table_end].cast("Q")
+        index.mask = capacity - 1
+        index.count = count
+        index.bloom = None
+        if bloom_words:
+            index.bloom = view[table_end : table_end + bloom_words * 8].cast("Q")
+            index.bloom_mask = bloom_words - 1
+        return index
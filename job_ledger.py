@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+
+SUBMITTED = "submitted"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+DOWNLOADED = "downloaded"
+
+
+class JobLedger:
+    """
+    Durable record of TTS jobs keyed by (text index, voice code), stored in
+    SQLite so an interrupted run can resume without re-submitting finished or
+    in-flight jobs. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                text_index INTEGER NOT NULL,
+                voice_code TEXT NOT NULL,
+                status TEXT NOT NULL,
+                request_id TEXT,
+                audio_link TEXT,
+                path TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (text_index, voice_code)
+            )
+            """)
+        self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get(self, index, voice_code):
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT * FROM jobs WHERE text_index = ? AND voice_code = ?",
+                (index, voice_code),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([column[0] for column in cursor.description], row))
+
+    def _update(self, index, voice_code, status, **fields):
+        columns = ["status", "updated_at"] + list(fields)
+        values = [status, time.time()] + list(fields.values())
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns)
+        with self.lock:
+            self.connection.execute(
+                f"""
+                INSERT INTO jobs (text_index, voice_code, {", ".join(columns)})
+                VALUES (?, ?, {", ".join("?" for _ in columns)})
+                ON CONFLICT (text_index, voice_code) DO UPDATE SET {assignments}
+                """,
+                [index, voice_code] + values,
+            )
+            self.connection.commit()
+
+    def mark_submitted(self, index, voice_code, request_id):
+        with self.lock:
+            self.connection.execute(
+                """
+                INSERT INTO jobs
+                    (text_index, voice_code, status, request_id, attempts, updated_at)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (text_index, voice_code) DO UPDATE SET
+                    status = excluded.status,
+                    request_id = excluded.request_id,
+                    attempts = jobs.attempts + 1,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                """,
+                (index, voice_code, SUBMITTED, request_id, time.time()),
+            )
+            self.connection.commit()
+
+    def mark_succeeded(self, index, voice_code, audio_link):
+        self._update(index, voice_code, SUCCEEDED, audio_link=audio_link)
+
+    def mark_downloaded(self, index, voice_code, path):
+        self._update(index, voice_code, DOWNLOADED, path=path, error=None)
+
+    def mark_failed(self, index, voice_code, error):
+        # Forget the request so the next run submits the text again
+        self._update(index, voice_code, FAILED, request_id=None, error=str(error))
+
+    def resumable_request_id(self, index, voice_code):
+        # Request already accepted by the API in an earlier run, if any
+        entry = self.get(index, voice_code)
+        if entry and entry["status"] in (SUBMITTED, SUCCEEDED):
+            return entry["request_id"]
+        return None
+
+    def downloaded_keys(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT text_index, voice_code FROM jobs WHERE status = ?",
+                (DOWNLOADED,),
+            ).fetchall()
+        return set(rows)
+
+    def summary(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def is_empty(self):
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM jobs LIMIT 1").fetchone()
+        return row is None
+
+    def import_downloaded(self, entries):
+        """
+        Bulk-records (index, voice_code, path) tuples as downloaded, e.g. to seed
+        a new ledger from clips produced before it existed.
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (text_index, voice_code, status, path, attempts, updated_at)
+                VALUES (?, ?, ?, ?, 1, ?)
+                """,
+                [
+                    (index, voice, DOWNLOADED, path, now)
+                    for index, voice, path in entries
+                ],
+            )
+            self.connection.commit()
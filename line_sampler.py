@@ -0,0 +1,153 @@
+import mmap
+import os
+
+import numpy as np
+
+from sidecar import is_fresh, replacing, sidecar_path
+
+INDEX_SUFFIX = ".offsets.npy"
+SCAN_BLOCK_BYTES = 64 * 1024 * 1024
+GATHER_LINES = 1 << 20
+
+
+def index_path(path):
+    return sidecar_path(path, INDEX_SUFFIX)
+
+
+def build_line_index(path):
+    """
+    Byte offsets of every line start in path, plus the file size as the last
+    entry, so line i is the bytes offsets[i]:offsets[i + 1].
+    """
+    starts = [np.zeros(1, dtype=np.uint64)]
+    position = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+            starts.append((newlines + position + 1).astype(np.uint64))
+            position += len(block)
+    offsets = np.concatenate(starts)
+    if offsets[-1] != position:
+        # Last line has no trailing newline
+        offsets = np.append(offsets, np.uint64(position))
+    return offsets
+
+
+def load_line_index(path):
+    # Reuses the saved index unless the file changed since it was written
+    cached = index_path(path)
+    if is_fresh(cached, path):
+        offsets = np.load(cached, mmap_mode="r")
+        if len(offsets) and offsets[-1] == os.path.getsize(path):
+            return offsets
+    offsets = build_line_index(path)
+    with replacing(cached, ".npy") as temp_path:
+        np.save(temp_path, offsets)
+    return offsets
+
+
+class LineReader:
+    """Random access to the lines of a file through its offset index and mmap."""
+
+    def __init__(self, path):
+        self.offsets = load_line_index(path)
+        self.file = open(path, "rb")
+        self.map = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(path)
+            else b""
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def line(self, number):
+        start, end = int(self.offsets[number]), int(self.offsets[number + 1])
+        return self.map[start:end].decode("utf-8")
+
+    def raw_lines(self, numbers):
+        # Yields the bytes of each line, gathering offsets a chunk at a time
+        numbers = np.asarray(numbers, dtype=np.int64)
+        for i in range(0, len(numbers), GATHER_LINES):
+            chunk = numbers[i : i + GATHER_LINES]
+            starts = self.offsets[chunk].tolist()
+            ends = self.offsets[chunk + 1].tolist()
+            for start, end in zip(starts, ends):
+                yield self.map[start:end]
+
+    def lines(self, numbers):
+        return [line.decode("utf-8") for line in self.raw_lines(numbers)]
+
+    def byte_lengths(self):
+        # Without the trailing newline
+        lengths = np.diff(self.offsets.astype(np.int64))
+        ends_with_newline = np.ones(len(lengths), dtype=bool)
+        if len(lengths) and self.map[-1:] != b"\n":
+            ends_with_newline[-1] = False
+        return lengths - ends_with_newline
+
+
+def sample_line_numbers(num_lines, count, rng, lengths=None, strata=None):
+    """
+    Draws count distinct line numbers uniformly, or, with strata, a list of
+    ((min_bytes, max_bytes), fraction) pairs, that fraction of the sample from
+    lines whose byte length falls in each inclusive range.
+    """
+    if strata is None:
+        return rng.choice(num_lines, size=min(count, num_lines), replace=False)
+    picked = []
+    for (low, high), fraction in strata:
+        candidates = np.flatnonzero((lengths >= low) & (lengths <= high))
+        wanted = min(int(round(count * fraction)), len(candidates))
+        picked.append(rng.choice(candidates, size=wanted, replace=False))
+    numbers = np.concatenate(picked) if picked else np.array([], dtype=np.int64)
+    rng.shuffle(numbers)
+    return numbers
+
+
+def sample_lines(path, count, seed=None, strata=None):
+    # Seeded random sample of count lines, read with one seek each
+    rng = np.random.default_rng(seed)
+    with LineReader(path) as reader:
+        lengths = reader.byte_lengths() if strata else None
+        numbers = sample_line_numbers(len(reader), count, rng, lengths, strata)
+        # Reading in file order keeps the seeks forward; the sample order stays random
+        order = np.argsort(numbers, kind="stable")
+        lines = [None] * len(numbers)
+        for position, line in zip(order.tolist(), reader.lines(numbers[order])):
+            lines[position] = line
+    return lines
+
+
+def split_lines(path, train_path, val_path, train_fraction=0.85, seed=None):
+    """
+    Shuffles the lines of path and writes the first train_fraction of them to
+    train_path and the rest to val_path. Only the permutation of line numbers
+    is held in memory. Returns the (train, val) line counts.
+    """
+    rng = np.random.default_rng(seed)
+    with LineReader(path) as reader:
+        permutation = rng.permutation(len(reader))
+        split_index = int(train_fraction * len(reader))
+        for output_path, numbers in (
+            (train_path, permutation[:split_index]),
+            (val_path, permutation[split_index:]),
+        ):
+            with open(output_path, "wb") as file:
+                for line in reader.raw_lines(numbers):
+                    file.write(line if line.endswith(b"\n") else line + b"\n")
+    return split_index, len(permutation) - split_index
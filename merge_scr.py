@@ -1,102 +1,149 @@
 import os
-import re
-import random
-from collections import Counter
-
-# List of Vietnamese characters
-vietnamese_characters = (
-    "ÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚĂĐĨŨƠàáâãèéêìíòóôõùúăđĩũơ"
-    "ƠƯĂÂĐÊÔƠƯ1234567890ăâêôơư"
-    "ĂÂÁẢÃẠẤẦẨẪẬẮẰẲẴẶ"
-    "đĐÊỀÉẸẺẼẾỀỂỄỆ"
-    "ÍÌỈĨỊ"
-    "ÔỐỒỔỖỘƠỚỜỞỠỢ"
-    "ÚÙỦŨỤƯỨỪỬỮỰ"
-    "ÝỲỶỸỴýỳỷỹỵ"
-    "áàạảã"
-    "âấầẩẫậ"
-    "ăắằẳẵặ"
-    "đ"
-    "éèẹẻẽ"
-    "êếềểễệ"
-    "íìịỉĩ"
-    "óòọỏõ"
-    "ôốồổỗộ"
-    "ơớờởỡợ"
-    "úùụủũ"
-    "ưứừửữự"
-    "ýỳỵỷỹ"
-)
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dedup_index import DedupIndex
+from line_sampler import sample_lines
+from near_dedup import near_dedup_file
+from text_normalizer import MERGE_FILTER, VIETNAMESE_CHARS
+from vocab_stats import count_tokens
 
 
 def is_vietnamese_char(char):
-    return char in vietnamese_characters
+    return char in VIETNAMESE_CHARS
 
 
 def is_vietnamese_line(line):
-    count = sum(1 for char in line if is_vietnamese_char(char))
-    return count / len(line) > 0.25
-
-
-def merge_text_files(src_dir, output_file):
-    with open(output_file, "w") as outfile:
-        for filename in os.listdir(src_dir):
-            if filename.endswith(".txt"):
-                file_path = os.path.join(src_dir, filename)
-                with open(file_path, "r") as infile:
-                    for line in infile:
-                        cleaned_line = line.strip()
-                        if 13 <= len(cleaned_line) <= 200:
-                            if not re.search(r'[-;>>*"”“…)\[\]\'’+_]', cleaned_line):
-                                if is_vietnamese_line(cleaned_line):
-                                    outfile.write(cleaned_line + "\n")
+    return MERGE_FILTER.alphabet_share(line) > MERGE_FILTER.min_alphabet_share
+
+
+def filter_text_file(file_path, shard_path):
+    """
+    Writes the lines of one source file that pass the merge filters to
+    shard_path and returns how many lines each filter dropped.
+    """
+    stats = {
+        "file": os.path.basename(file_path),
+        "lines": 0,
+        "length": 0,
+        "symbols": 0,
+        "language": 0,
+        "accepted": 0,
+    }
+    with open(file_path, "r") as infile, open(shard_path, "w") as outfile:
+        for line in infile:
+            stats["lines"] += 1
+            cleaned_line = MERGE_FILTER.normalize(line)
+            reason = MERGE_FILTER.rejection(cleaned_line)
+            if reason:
+                stats[reason] += 1
+            else:
+                stats["accepted"] += 1
+                outfile.write(cleaned_line + "\n")
+    return stats
+
+
+def merge_text_files(src_dir, output_file, workers=None):
+    """
+    Filters every .txt file in src_dir in parallel worker processes, one shard
+    per file, then concatenates the shards in filename order so the output is
+    the same whatever the number of workers. Returns per-file stats.
+    """
+    filenames = sorted(name for name in os.listdir(src_dir) if name.endswith(".txt"))
+    shard_dir = output_file + ".shards"
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_paths = [
+        os.path.join(shard_dir, f"{i:06d}.txt") for i in range(len(filenames))
+    ]
+    stats = [None] * len(filenames)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Biggest files first so a large one doesn't start last
+            order = sorted(
+                range(len(filenames)),
+                key=lambda i: os.path.getsize(os.path.join(src_dir, filenames[i])),
+                reverse=True,
+            )
+            futures = {
+                executor.submit(
+                    filter_text_file,
+                    os.path.join(src_dir, filenames[i]),
+                    shard_paths[i],
+                ): i
+                for i in order
+            }
+            for future in as_completed(futures):
+                stats[futures[future]] = future.result()
+
+        with open(output_file, "wb") as outfile:
+            for shard_path in shard_paths:
+                with open(shard_path, "rb") as infile:
+                    shutil.copyfileobj(infile, outfile, 1 << 20)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    for file_stats in stats:
+        print(
+            f"{file_stats['file']}: kept {file_stats['accepted']}/{file_stats['lines']} "
+            f"(length {file_stats['length']}, symbols {file_stats['symbols']}, "
+            f"language {file_stats['language']})"
+        )
+    return stats
 
 
 def convert_to_lowercase(input_file, output_file):
-    seen_lines = set()
+    # Hashes instead of full strings keep memory bounded on multi-GB merges
+    seen_lines = DedupIndex()
     with open(input_file, "r") as infile, open(output_file, "w") as outfile:
         for line in infile:
             lower_line = line.lower().strip()
-            if lower_line and lower_line not in seen_lines:
-                seen_lines.add(lower_line)
+            if lower_line and seen_lines.add(lower_line):
                 outfile.write(lower_line + "\n")
 
 
-def select_random_lines(input_file, output_file, num_lines):
-    with open(input_file, "r") as infile:
-        lines = infile.readlines()
-    random.shuffle(lines)
-    selected_lines = lines[:num_lines]
+def select_random_lines(input_file, output_file, num_lines, seed=None):
+    # Seeks to the sampled lines through a cached offset index instead of
+    # reading and shuffling the whole file
+    selected_lines = sample_lines(input_file, num_lines, seed)
     with open(output_file, "w") as outfile:
         outfile.writelines(selected_lines)
     return selected_lines
 
 
 def count_unique_words(lines):
-    word_counter = Counter()
-    for line in lines:
-        words = re.findall(r"\b\w+\b", line)
-        word_counter.update(words)
-    return len(word_counter)
+    return len(count_tokens(lines))
+
+
+def main():
+    lowercase_file = "src/collection_merge_lc.txt"
+    deduped_file = "src/collection_merge_dedup.txt"
+    selected_file = "src_collection_unique.txt"
+
+    # # Step 1: Merge the text files
+    # src_dir = "src/collection"
+    # merged_file = "src/collection_merge.txt"
+    # merge_text_files(src_dir, merged_file)
+    # print(f"Merged files into {merged_file}")
 
+    # # Step 2: Convert the merged file to lowercase
+    # convert_to_lowercase(merged_file, lowercase_file)
+    # print(f"Converted all characters to lowercase in {lowercase_file}")
 
-src_dir = "src/collection"
-merged_file = "src/collection_merge.txt"
-lowercase_file = "src/collection_merge_lc.txt"
-selected_file = "src_collection_unique.txt"
+    # Step 3: Drop near-duplicates (lines differing by punctuation or a word or so)
+    if not os.path.exists(deduped_file):
+        kept, dropped = near_dedup_file(lowercase_file, deduped_file, threshold=0.7)
+        print(f"Dropped {dropped} near-duplicate lines, {kept} left in {deduped_file}")
 
-# # Step 1: Merge the text files
-# merge_text_files(src_dir, merged_file)
-# print(f"Merged files into {merged_file}")
+    # Step 4: Randomly select 50,000 lines from the deduplicated file
+    selected_lines = select_random_lines(deduped_file, selected_file, 25000)
+    print(f"Selected 25,000 lines and saved to {selected_file}")
 
-# # Step 2: Convert the merged file to lowercase
-# convert_to_lowercase(merged_file, lowercase_file)
-# print(f"Converted all characters to lowercase in {lowercase_file}")
+    # Step 5: Count the total number of unique words in the selected lines
+    unique_word_count = count_unique_words(selected_lines)
+    print(f"Total number of unique words: {unique_word_count}")
 
-# Step 3: Randomly select 50,000 lines from the lowercase file
-selected_lines = select_random_lines(lowercase_file, selected_file, 25000)
-print(f"Selected 25,000 lines and saved to {selected_file}")
 
-# Step 4: Count the total number of unique words in the selected lines
-unique_word_count = count_unique_words(selected_lines)
-print(f"Total number of unique words: {unique_word_count}")
+# Worker processes import this module, so the steps only run as a script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import re
+import zlib
+from itertools import islice
+
+import numpy as np
+
+from text_normalizer import normalize_spacing
+
+WORD = re.compile(r"\w+")
+UINT64_MAX = np.iinfo(np.uint64).max
+
+
+def word_hashes(lines):
+    """
+    CRC32 of every word of every normalized line as one flat array, plus the
+    number of words in each line.
+    """
+    # Case, Unicode composition and spacing don't change the words
+    words = [WORD.findall(normalize_spacing(line).lower()) for line in lines]
+    counts = np.array([len(line_words) for line_words in words], dtype=np.int64)
+    flat = np.fromiter(
+        (
+            zlib.crc32(word.encode("utf-8"))
+            for line_words in words
+            for word in line_words
+        ),
+        dtype=np.uint64,
+        count=int(counts.sum()),
+    )
+    return flat, counts
+
+
+def shingle_hashes(lines, shingle_size=2, seed=1):
+    """
+    64-bit hashes of the word n-grams of each line, flat and grouped by line,
+    with the number of shingles per line. A line shorter than shingle_size is
+    one shingle of all its words.
+    """
+    hashes, counts = word_hashes(lines)
+    line_ids = np.repeat(np.arange(len(counts)), counts)
+    multipliers = np.random.default_rng(seed).integers(
+        1, 1 << 63, size=shingle_size, dtype=np.uint64
+    )
+    combined = np.zeros(len(hashes), dtype=np.uint64)
+    for offset in range(shingle_size):
+        # Word at position + offset, counted only while still in the same line
+        shifted = np.zeros(len(hashes), dtype=np.uint64)
+        same_line = np.zeros(len(hashes), dtype=bool)
+        if offset < len(hashes):
+            shifted[: len(hashes) - offset] = hashes[offset:]
+            same_line[: len(hashes) - offset] = (
+                line_ids[offset:] == line_ids[: len(hashes) - offset]
+            )
+        combined += np.where(same_line, shifted * multipliers[offset], 0)
+
+    # A shingle starts at every word with shingle_size - 1 words after it in
+    # the same line, or at the first word of a shorter line
+    line_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = np.arange(len(hashes)) - np.repeat(line_starts, counts)
+    valid = (position + shingle_size <= np.repeat(counts, counts)) | (
+        (position == 0) & (np.repeat(counts, counts) < shingle_size)
+    )
+    shingle_counts = np.bincount(line_ids[valid], minlength=len(counts))
+    return combined[valid], shingle_counts
+
+
+def optimal_bands(threshold, num_perm):
+    """
+    (bands, rows) whose LSH S-curve 1 - (1 - s**rows)**bands crosses 0.5
+    closest to threshold, so pairs above it are caught and pairs below missed.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        crossing = (1 - 0.5 ** (1 / bands)) ** (1 / rows)
+        error = abs(crossing - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def splitmix64(x):
+    # Spreads band hashes over all 64 bits; x is modified in place
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+class BandIndex:
+    """
+    Multimap of 64-bit band keys to uint32 line ids, 12 bytes per entry. Each
+    added batch becomes a run sorted by key, and runs are merged while the
+    last is no larger than the new one, so there are O(log n) runs to search.
+    """
+
+    def __init__(self):
+        self.runs = []  # (keys, ids), both sorted by key
+
+    def add(self, keys, ids):
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        while self.runs and len(self.runs[-1][0]) <= len(keys):
+            run_keys, run_ids = self.runs.pop()
+            keys = np.concatenate((run_keys, keys))
+            ids = np.concatenate((run_ids, ids))
+            order = np.argsort(keys, kind="stable")
+            keys, ids = keys[order], ids[order]
+        self.runs.append((keys, ids))
+
+    def lookup(self, keys):
+        """
+        Every stored entry equal to one of keys, as (positions in keys, ids)
+        arrays of the same length.
+        """
+        positions, ids = [np.empty(0, np.int64)], [np.empty(0, np.uint32)]
+        # Sorted queries walk each run in order, far faster than random probes
+        order = np.argsort(keys)
+        keys = keys[order]
+        for run_keys, run_ids in self.runs:
+            left = np.searchsorted(run_keys, keys, "left")
+            counts = np.searchsorted(run_keys, keys, "right") - left
+            found = np.flatnonzero(counts)
+            if not len(found):
+                continue
+            counts = counts[found]
+            # Every index from left to right - 1 of each found key, flattened
+            offsets = np.repeat(left[found] - np.cumsum(counts) + counts, counts)
+            positions.append(np.repeat(order[found], counts))
+            ids.append(run_ids[offsets + np.arange(counts.sum())])
+        return np.concatenate(positions), np.concatenate(ids)
+
+
+class MinHashLSH:
+    """
+    Streaming near-duplicate filter. Lines are reduced to num_perm MinHash
+    values over their word shingles, which are split into bands. The kept
+    lines sharing a band with a new line are its candidates; it is a
+    near-duplicate when the share of MinHash values it has in common with one
+    of them, an estimate of their Jaccard similarity, reaches threshold.
+    Kept lines cost num_perm * 4 bytes of uint32 signature and 12 bytes per
+    band in a BandIndex. A batch is checked against earlier batches in numpy
+    and against itself in order.
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, shingle_size=2, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.a = rng.integers(1, UINT64_MAX, size=(num_perm, 1), dtype=np.uint64) | 1
+        self.b = rng.integers(0, UINT64_MAX, size=(num_perm, 1), dtype=np.uint64)
+        self.band_mix = rng.integers(
+            1, 1 << 63, size=(1, self.bands, self.rows), dtype=np.uint64
+        )
+        self.index = BandIndex()
+        self.kept = np.empty((1024, num_perm), dtype=np.uint32)
+        self.count = 0
+
+    def signatures(self, hashes, counts):
+        """
+        MinHash signatures of the lines of a batch as a (len(counts), num_perm)
+        array, from their flat shingle hashes; lines without shingles are all max.
+        """
+        result = np.full((len(counts), self.num_perm), UINT64_MAX, np.uint64)
+        present = np.flatnonzero(counts)
+        if not len(present):
+            return result
+        # Multiply-shift hashes (a * x + b) >> 32 stand in for random permutations
+        hashed = (self.a * hashes + self.b) >> np.uint64(32)
+        starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        result[present] = np.minimum.reduceat(hashed, starts, axis=1).T
+        return result
+
+    def band_keys(self, signatures):
+        usable = signatures[:, : self.bands * self.rows].reshape(
+            len(signatures), self.bands, self.rows
+        )
+        keys = (usable * self.band_mix).sum(axis=2, dtype=np.uint64)
+        keys += np.arange(self.bands, dtype=np.uint64)  # Same values, other band
+        keys = splitmix64(keys)
+        keys[keys == 0] = 1
+        return keys
+
+    def similar(self, signatures, others):
+        # Row-wise: is the estimated Jaccard similarity at least threshold
+        return (signatures == others).mean(axis=1) >= self.threshold
+
+    def filter_lines(self, lines):
+        # Yields (line, is_new) for a batch, in order
+        hashes, counts = shingle_hashes(lines, self.shingle_size, self.seed)
+        signatures = self.signatures(hashes, counts)
+        keys = self.band_keys(signatures)
+        # Hashes are shifted right by 32 bits, so they fit in uint32
+        signatures = signatures.astype(np.uint32)
+        # Lines without words can't be compared; they pass but aren't kept
+        present = np.flatnonzero(counts)
+        is_new = np.zeros(len(lines), dtype=bool)
+        is_new[present] = True
+
+        # Kept lines of earlier batches sharing a band, each pair checked once
+        positions, ids = self.index.lookup(keys[present].ravel())
+        if len(positions):
+            rows = present[positions // self.bands]
+            pairs = np.unique((rows.astype(np.uint64) << np.uint64(32)) | ids)
+            rows = (pairs >> np.uint64(32)).astype(np.int64)
+            ids = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int64)
+            is_new[rows[self.similar(signatures[rows], self.kept[ids])]] = False
+
+        # Lines of this batch against the ones kept before them in it; only
+        # lines sharing a band with another line of the batch can clash
+        rows = np.flatnonzero(is_new)
+        _, inverse, key_counts = np.unique(
+            keys[rows], return_inverse=True, return_counts=True
+        )
+        shared = (
+            (key_counts[inverse.reshape(-1)] > 1).reshape(len(rows), -1).any(axis=1)
+        )
+        buckets = {}  # Band key -> rows kept in this batch
+        for row in rows[shared].tolist():
+            line_keys = keys[row].tolist()
+            candidates = {other for key in line_keys for other in buckets.get(key, ())}
+            if (
+                candidates
+                and self.similar(signatures[list(candidates)], signatures[row]).any()
+            ):
+                is_new[row] = False
+                continue
+            for key in line_keys:
+                buckets.setdefault(key, []).append(row)
+        kept_rows = rows[is_new[rows]]
+
+        if len(kept_rows):
+            end = self.count + len(kept_rows)
+            if end > len(self.kept):
+                grown = np.empty(
+                    (max(end, 2 * len(self.kept)), self.num_perm), np.uint32
+                )
+                grown[: self.count] = self.kept[: self.count]
+                self.kept = grown
+            self.kept[self.count : end] = signatures[kept_rows]
+            ids = np.arange(self.count, end, dtype=np.uint32)
+            self.index.add(keys[kept_rows].ravel(), np.repeat(ids, self.bands))
+            self.count = end
+
+        for line, count, new in zip(lines, counts.tolist(), is_new.tolist()):
+            yield line, not count or new
+
+
+def near_dedup_file(
+    input_path,
+    output_path,
+    threshold=0.7,
+    num_perm=64,
+    shingle_size=2,
+    batch_size=4096,
+    seed=1,
+):
+    """
+    Copies input_path to output_path without lines that are near-duplicates
+    (estimated Jaccard similarity of word shingles above threshold) of an
+    earlier line. Returns the (kept, dropped) counts.
+    """
+    lsh = MinHashLSH(threshold, num_perm, shingle_size, seed)
+    kept = dropped = 0
+    with open(input_path, "r", encoding="utf-8") as infile, open(
+        output_path, "w", encoding="utf-8"
+    ) as outfile:
+        while True:
+            batch = list(islice(infile, batch_size))
+            if not batch:
+                break
+            for line, is_new in lsh.filter_lines(batch):
+                if is_new:
+                    outfile.write(line)
+                    kept += 1
+                else:
+                    dropped += 1
+    return kept, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drop near-duplicate lines from a text corpus with MinHash/LSH."
+    )
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--shingle-size", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    kept, dropped = near_dedup_file(
+        args.input,
+        args.output,
+        args.threshold,
+        args.num_perm,
+        args.shingle_size,
+        args.batch_size,
+    )
+    print(f"Kept {kept} lines, dropped {dropped} near-duplicates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import importlib
+import sys
+
+# Stage name: (module, description, whether its main() parses its own options).
+# Modules are imported only when their stage runs.
+STAGES = {
+    "merge": ("merge_scr", "Merge, filter and deduplicate the text collection", False),
+    "near-dedup": ("near_dedup", "Drop near-duplicate lines of a text file", True),
+    "vocab": ("vocab_stats", "Syllable and tone coverage statistics", True),
+    "script": ("data_prep", "Select the TTS recording script from the corpus", False),
+    "tts": ("vbee_generator", "Synthesize the script with the Vbee TTS API", False),
+    "tts-bench": ("vbee_fake_server", "Benchmark TTS on a fake server", True),
+    "qc": ("audio_qc", "Check the synthesized clips", True),
+    "assemble": ("data_assemble", "Keep the transcripts of passing clips", False),
+    "split": ("data_training", "Split the dataset into training and validation", True),
+    "resample": ("audio_resample", "Resample WAV files to mono", True),
+    "segment": ("segment_batch", "Cut WAV files into speech chunks", True),
+    "transcribe": ("transcriber", "Transcribe speech chunks in parallel", True),
+    "ingest": ("youtube_ingest", "Cut YouTube videos into speech chunks", True),
+    "youtube": ("youtube_generator", "Chunk and transcribe one YouTube video", True),
+    "download": ("youtube_vid_downloader", "Download a list of YouTube videos", True),
+    "bench-normalizer": ("bench_normalizer", "Benchmark the text normalizer", True),
+    "bench-startup": ("bench_startup", "Measure how fast each stage starts", True),
+}
+
+
+def build_parser():
+    width = max(len(name) for name in STAGES)
+    return argparse.ArgumentParser(
+        prog="pipeline.py",
+        description="Run one stage of the dataset pipeline. Options after the "
+        "stage go to the stage; pipeline.py STAGE --help lists them.",
+        epilog="stages:\n"
+        + "\n".join(
+            f"  {name:<{width}}  {description}"
+            for name, (_, description, _) in STAGES.items()
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    parser.add_argument("stage", choices=STAGES, metavar="STAGE")
+    # Only the stage name is parsed here, so --help after it reaches the stage
+    stage = parser.parse_args(argv[:1]).stage
+    module_name, description, parses_options = STAGES[stage]
+    prog = f"{parser.prog} {stage}"
+    if not parses_options:
+        # Paths of these stages are set in their main(); accept --help only
+        argparse.ArgumentParser(prog=prog, description=description).parse_args(argv[1:])
+    module = importlib.import_module(module_name)
+    sys.argv = [prog] + argv[1:]
+    return module.main()
+
+
+if __name__ == "__main__":
+    main()
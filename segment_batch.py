@@ -0,0 +1,220 @@
+""" Filename: segment_batch.py - Directory: ./ """
+
+import argparse  # For command line options
+import json  # For per-file result manifests
+import os  # For file path operations
+import time  # To calculate process duration
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import extract_speech_chunks
+
+
+def collect_sources(source):
+    """
+    Collect the source WAV files from a directory (recursively) or from a
+    manifest file listing one path per line.
+    """
+    if os.path.isdir(source):
+        sources = []
+        for root, dirs, files in os.walk(source):
+            for file in files:
+                if file.endswith(".wav"):
+                    sources.append(os.path.join(root, file))
+    else:
+        with open(source, "r", encoding="utf-8") as file:
+            sources = [line.strip() for line in file if line.strip()]
+    sources.sort()
+
+    # Chunk names are derived from the file name, so it must be unique
+    names = {}
+    for path in sources:
+        name = source_name(path)
+        if name in names:
+            raise ValueError(f"Duplicate source name '{name}': {names[name]}, {path}")
+        names[name] = path
+    return sources
+
+
+def source_name(source_path):
+    """
+    Base name used for the chunks and manifest of a source file.
+    """
+    return os.path.splitext(os.path.basename(source_path))[0]
+
+
+def manifest_path(output_dir, name):
+    """
+    Path of the result manifest written for one source file.
+    """
+    return os.path.join(output_dir, f"{name}_manifest.json")
+
+
+def source_signature(source_path):
+    """
+    Identify a source file by path, size and modification time.
+    """
+    stat = os.stat(source_path)
+    return {
+        "path": os.path.abspath(source_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def load_manifest(path):
+    """
+    Load a result manifest, or return None if it is missing or unreadable.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_up_to_date(manifest, signature, params):
+    """
+    Check that a manifest was produced from this exact source with the same
+    parameters and that every chunk it lists is still on disk, unchanged.
+    """
+    if (
+        manifest is None
+        or manifest.get("source") != signature
+        or manifest.get("params") != params
+    ):
+        return False
+    for chunk in manifest["chunks"]:
+        try:
+            if os.path.getsize(chunk["path"]) != chunk["size"]:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def write_manifest(manifest, path):
+    """
+    Write a manifest atomically so an interrupted run never leaves a partial one.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def segment_source(source_path, output_dir, params, streaming=True):
+    """
+    Segment one source file into speech chunks unless its manifest shows the
+    chunks already exist for this source. Runs inside a worker process.
+    """
+    name = source_name(source_path)
+    path = manifest_path(output_dir, name)
+    signature = source_signature(source_path)
+    previous = load_manifest(path)
+
+    if is_up_to_date(previous, signature, params):
+        return {
+            "source": source_path,
+            "status": "skipped",
+            "chunks": len(previous["chunks"]),
+        }
+
+    # Remove chunks left by an earlier run so stale extras don't linger
+    if previous is not None:
+        for chunk in previous.get("chunks", []):
+            if os.path.exists(chunk["path"]):
+                os.remove(chunk["path"])
+
+    start_time = time.time()
+    chunk_paths = extract_speech_chunks(
+        source_path, output_dir, name, streaming=streaming, **params
+    )
+    manifest = {
+        "source": signature,
+        "params": params,
+        "chunks": [
+            {"path": os.path.abspath(chunk_path), "size": os.path.getsize(chunk_path)}
+            for chunk_path in chunk_paths
+        ],
+        "seconds": round(time.time() - start_time, 3),
+    }
+    write_manifest(manifest, path)
+    return {"source": source_path, "status": "segmented", "chunks": len(chunk_paths)}
+
+
+def segment_batch(sources, output_dir, params, workers=None, streaming=True):
+    """
+    Segment many source files in parallel across worker processes.
+    Returns one result dict per source; failures are reported, not raised.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(segment_source, path, output_dir, params, streaming): path
+            for path in sources
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {
+                    "source": futures[future],
+                    "status": "failed",
+                    "error": str(e),
+                }
+            print(f"{result['status']}: {result['source']}")
+            results.append(result)
+    return results
+
+
+def main():
+    """
+    Main function to run the program.
+    """
+    parser = argparse.ArgumentParser(
+        description="Segment a directory or manifest of WAV recordings into speech chunks."
+    )
+    parser.add_argument(
+        "source", help="Directory of .wav files or a file listing WAV paths"
+    )
+    parser.add_argument("output_dir", help="Directory for chunks and result manifests")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--min-silence-len", type=int, default=500)
+    parser.add_argument("--silence-thresh", type=int, default=-25)
+    parser.add_argument("--min-length", type=int, default=4000)
+    parser.add_argument("--max-length", type=int, default=15000)
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="Decode whole files with pydub instead of streaming WAV blocks",
+    )
+    args = parser.parse_args()
+
+    params = {
+        "min_silence_len": args.min_silence_len,
+        "silence_thresh": args.silence_thresh,
+        "min_length": args.min_length,
+        "max_length": args.max_length,
+    }
+
+    start_time = time.time()
+    sources = collect_sources(args.source)
+    results = segment_batch(
+        sources,
+        args.output_dir,
+        params,
+        workers=args.workers,
+        streaming=not args.in_memory,
+    )
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(
+        f"Processed {len(results)} files in {time.time() - start_time:.2f} seconds: {counts}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+from contextlib import contextmanager
+
+
+def sidecar_path(path, suffix):
+    # Next to the file or directory, not inside it, so saving doesn't change
+    # a directory's mtime
+    return os.path.normpath(path) + suffix
+
+
+def is_fresh(cached_path, source_path):
+    # True if the cache exists and was written after the source last changed
+    return os.path.exists(cached_path) and os.path.getmtime(
+        cached_path
+    ) >= os.path.getmtime(source_path)
+
+
+@contextmanager
+def replacing(path, suffix=""):
+    """
+    Yields a temporary path to write path's new content to. It replaces path
+    in one step once the block ends, so readers never see a half-written
+    file, and is removed if the block fails. suffix is the extension writers
+    such as np.save would otherwise append.
+    """
+    temp_path = path + ".tmp" + suffix
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_resample import READ_FRAMES, Resampler, convert_file
+
+
+@pytest.mark.parametrize("src_rate, dst_rate", [(96000, 22050), (22050, 16000)])
+@pytest.mark.parametrize("tail", [1, 2, 3])
+def test_short_final_block(src_rate, dst_rate, tail):
+    signal = np.random.default_rng(0).uniform(-0.5, 0.5, 4096 + tail)
+    resampler = Resampler(src_rate, dst_rate)
+    out = np.concatenate(
+        (resampler.process(signal[:4096]), resampler.process(signal[4096:]))
+    )
+    out = np.concatenate((out, resampler.flush()))
+    assert len(out) == -(-len(signal) * dst_rate // src_rate)
+
+    whole = Resampler(src_rate, dst_rate)
+    expected = np.concatenate((whole.process(signal), whole.flush()))
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+
+
+def test_convert_file_one_frame_past_a_block(tmp_path):
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    signal = np.random.default_rng(0).uniform(-0.5, 0.5, (READ_FRAMES + 1, 2))
+    sf.write(input_path, signal, 48000, subtype="PCM_24")
+
+    _, source_rate, frames = convert_file(input_path, output_path, 22050)
+
+    assert source_rate == 48000
+    assert frames == -(-(READ_FRAMES + 1) * 22050 // 48000)
+    info = sf.info(output_path)
+    assert (info.frames, info.channels, info.subtype) == (frames, 1, "PCM_24")
+    assert not os.path.exists(output_path + ".part")
+
+
+def test_convert_file_removes_partial_output(tmp_path, monkeypatch):
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    sf.write(input_path, np.zeros(48000), 48000)
+
+    def fail(self, block):
+        raise RuntimeError("resampling failed")
+
+    monkeypatch.setattr(Resampler, "process", fail)
+    with pytest.raises(RuntimeError):
+        convert_file(input_path, output_path)
+    assert not os.path.exists(output_path + ".part")
+    assert not os.path.exists(output_path)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_index import DedupIndex
+
+
+def test_matches_a_set_of_stripped_lines():
+    lines = ["Hôm nay trời đẹp", "hôm nay trời đẹp", "hôm nay  trời đẹp", "  a b \n"]
+    index = DedupIndex(capacity=4)
+    added = [index.add(line) for line in lines + ["a b"]]
+    assert added == [True, True, True, True, False]
+    assert "a b\n" in index
+    assert "A b" not in index
+    assert len(index) == 4
+
+
+def test_saved_index_reloads(tmp_path):
+    path = str(tmp_path / "prior.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"dòng {i}\n" for i in range(5000)))
+
+    built = DedupIndex.for_file(path)
+    loaded = DedupIndex.for_file(path)
+
+    assert os.path.exists(path + ".dedup.idx")
+    assert len(built) == len(loaded) == 5000
+    assert "dòng 42" in loaded and "Dòng 42" not in loaded
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_dedup import MinHashLSH
+
+
+def kept(lines, threshold=0.7):
+    lsh = MinHashLSH(threshold)
+    return [line for line, is_new in lsh.filter_lines(lines) if is_new]
+
+
+def test_drops_near_duplicates():
+    lines = [
+        "hôm nay trời đẹp quá chúng ta đi chơi công viên nhé",
+        "Hôm nay trời đẹp quá, chúng ta đi chơi công viên nhé!",
+        "hôm nay trời đẹp quá chúng ta đi chơi công viên nhé bạn",
+    ]
+    assert kept(lines) == lines[:1]
+
+
+def test_keeps_lines_below_threshold():
+    # Shingles {a b, b c} and {a b, b c, c d}: Jaccard 2/3
+    assert kept(["a b c", "a b c d"]) == ["a b c", "a b c d"]
+
+
+def test_keeps_unrelated_lines():
+    lines = [f"dòng số {i} khác hẳn {i * 7} những dòng còn lại" for i in range(2000)]
+    lines += ["một câu hoàn toàn mới", "một câu hoàn toàn khác"]
+    assert len(kept(lines)) > 1990
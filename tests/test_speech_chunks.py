@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import extract_speech_chunks
+
+
+def write_speech(path, seconds, rate=16000):
+    # Loud noise throughout: one speech interval from start to end
+    noise = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * rate))
+    sf.write(path, noise, rate, subtype="PCM_16")
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("seconds", [3, 5])
+def test_clip_shorter_than_intro_is_kept_whole(tmp_path, seconds, streaming):
+    path = str(tmp_path / "short.wav")
+    write_speech(path, seconds)
+
+    chunk_paths = extract_speech_chunks(
+        path, str(tmp_path / "chunks"), "short", streaming=streaming, skip_intro=False
+    )
+
+    durations = [sf.info(chunk).duration for chunk in chunk_paths]
+    assert sum(durations) == pytest.approx(seconds, abs=0.01)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_intro_is_skipped_by_default(tmp_path, streaming):
+    path = str(tmp_path / "long.wav")
+    write_speech(path, 9)
+
+    chunk_paths = extract_speech_chunks(
+        path, str(tmp_path / "chunks"), "long", streaming=streaming
+    )
+
+    assert [sf.info(chunk).duration for chunk in chunk_paths] == [
+        pytest.approx(3, abs=0.01)
+    ]
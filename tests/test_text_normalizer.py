@@ -0,0 +1,31 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalizer import SCRIPT_LINE
+
+
+def old_clean_line(line):
+    # data_prep.clean_line before text_normalizer
+    for char in '()"-_':
+        line = line.replace(char, "")
+    line = line.replace(" ,", ",")
+    line = line.replace("  ", " ")
+    line = line.replace(";", ",")
+    line = line.replace("…", ".")
+    line = line.replace("...", ".")
+    line = line.strip(",. ;")
+    return line[:200]
+
+
+def test_script_line_matches_old_clean_line():
+    rng = random.Random(0)
+    lines = ["a ;b", "a  ,b", "a    b", "x......y", "a , ,b", "(a) - b…"]
+    lines += [
+        "".join(rng.choice(' ,;.…()"-_ab') for _ in range(rng.randint(0, 40)))
+        for _ in range(20000)
+    ]
+    for line in lines:
+        assert SCRIPT_LINE.normalize(line) == old_clean_line(line), repr(line)
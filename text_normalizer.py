@@ -0,0 +1,183 @@
+import re
+import unicodedata
+
+# Letters (and digits) that count towards a line being Vietnamese
+VIETNAMESE_CHARACTERS = (
+    "ÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚĂĐĨŨƠàáâãèéêìíòóôõùúăđĩũơ"
+    "ƠƯĂÂĐÊÔƠƯ1234567890ăâêôơư"
+    "ĂÂÁẢÃẠẤẦẨẪẬẮẰẲẴẶ"
+    "đĐÊỀÉẸẺẼẾỀỂỄỆ"
+    "ÍÌỈĨỊ"
+    "ÔỐỒỔỖỘƠỚỜỞỠỢ"
+    "ÚÙỦŨỤƯỨỪỬỮỰ"
+    "ÝỲỶỸỴýỳỷỹỵ"
+    "áàạảã"
+    "âấầẩẫậ"
+    "ăắằẳẵặ"
+    "đ"
+    "éèẹẻẽ"
+    "êếềểễệ"
+    "íìịỉĩ"
+    "óòọỏõ"
+    "ôốồổỗộ"
+    "ơớờởỡợ"
+    "úùụủũ"
+    "ưứừửữự"
+    "ýỳỵỷỹ"
+)
+VIETNAMESE_CHARS = frozenset(VIETNAMESE_CHARACTERS)
+# Every character str.isspace() and the regex \s accept, other than the space
+OTHER_WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f\x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+
+def normalize_spacing(text):
+    # NFC with whitespace runs collapsed: texts that only differ in Unicode
+    # composition or spacing are the same text
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TextNormalizer:
+    """
+    A set of cleaning and filtering rules compiled once. Literal rewrites run
+    first, in order, each until its text no longer occurs (or, without
+    repeat_literals, as one str.replace like the old cleaners); every rule that
+    needs a character class is an alternative of one combined regex applied
+    in a single re.sub pass; then the result is stripped and cut to
+    max_length. Lines can also be rejected for their length, for containing a
+    rejected character, or for having too small a share of alphabet
+    characters.
+    """
+
+    def __init__(
+        self,
+        literals=(),
+        repeat_literals=True,
+        substitutions=(),
+        strip=None,
+        max_length=None,
+        length_range=None,
+        rejected=None,
+        alphabet=None,
+        min_alphabet_share=0.0,
+    ):
+        # str.translate looks every character up in a dict, which on non-ASCII
+        # text is several times slower than a str.replace per mapped character
+        self.literals = tuple(literals)
+        self.repeat_literals = repeat_literals
+        for old, new in self.literals if repeat_literals else ():
+            if old in new:
+                raise ValueError(f"Replacing {old!r} with {new!r} never ends")
+        # For many single characters one class search is cheaper than a
+        # substring test each on the lines that hold none of them, most lines
+        self.literal_class = (
+            re.compile("[%s]" % re.escape("".join(old for old, _ in self.literals)))
+            if len(self.literals) > 8 and all(len(old) == 1 for old, _ in self.literals)
+            else None
+        )
+
+        self.group_replacements = {
+            f"r{i}": new for i, (_, new) in enumerate(substitutions)
+        }
+        if len(set(self.group_replacements.values())) == 1:
+            # One shared replacement string: no groups to capture and re.sub
+            # never has to call back into Python
+            self.replacement = substitutions[0][1]
+            parts = [f"(?:{pattern})" for pattern, _ in substitutions]
+        else:
+            # Each rule is one named group, so a match tells which one it was
+            self.replacement = self._replace
+            parts = [
+                f"(?P<r{i}>{pattern})" for i, (pattern, _) in enumerate(substitutions)
+            ]
+        self.pattern = re.compile("|".join(parts)) if parts else None
+
+        self.strip_chars = strip
+        self.max_length = max_length
+        self.length_range = length_range
+        self.rejected = re.compile(rejected) if rejected else None
+        self.alphabet = (
+            re.compile("[%s]" % re.escape("".join(sorted(alphabet))))
+            if alphabet
+            else None
+        )
+        self.min_alphabet_share = min_alphabet_share
+
+    def _replace(self, match):
+        return self.group_replacements[match.lastgroup]
+
+    def rewrite(self, text):
+        if self.literal_class is None or self.literal_class.search(text):
+            for old, new in self.literals:
+                while old in text:
+                    text = text.replace(old, new)
+                    if not self.repeat_literals:
+                        break
+        if self.pattern is not None:
+            text = self.pattern.sub(self.replacement, text)
+        return text
+
+    def trim(self, text):
+        text = text.strip(self.strip_chars)
+        return text[: self.max_length] if self.max_length else text
+
+    def normalize(self, text):
+        return self.trim(self.rewrite(text))
+
+    __call__ = normalize
+
+    def alphabet_share(self, text):
+        return len(self.alphabet.findall(text)) / len(text) if text else 0.0
+
+    def rejection(self, text):
+        # "length", "symbols" or "language" if the normalized line is dropped
+        if self.length_range and not (
+            self.length_range[0] <= len(text) <= self.length_range[1]
+        ):
+            return "length"
+        if self.rejected is not None and self.rejected.search(text):
+            return "symbols"
+        if self.alphabet is not None and not (
+            self.alphabet_share(text) > self.min_alphabet_share
+        ):
+            return "language"
+        return None
+
+    def clean(self, text):
+        # Normalized text, or None if it is rejected
+        text = self.normalize(text)
+        return None if self.rejection(text) else text
+
+    def batch(self, lines):
+        # Normalized lines in order, None for the rejected ones
+        return [self.clean(line) for line in lines]
+
+
+# Transcripts next to audio chunks: word characters and basic punctuation
+TRANSCRIPT = TextNormalizer(
+    literals=[(char, " ") for char in OTHER_WHITESPACE],
+    # Removes other symbols, and every space followed by another space once
+    # those are gone; same as removing them, then collapsing runs of spaces
+    substitutions=[(r"[^\w\s.,'!?]+", ""), (r" (?=[^\w\s.,'!?]* )", "")],
+)
+
+# Sentences of TTS recording scripts. Each rewrite runs once, in this order,
+# as data_prep.clean_line always did, so existing scripts come out the same
+SCRIPT_LINE = TextNormalizer(
+    literals=[(char, "") for char in '()"-_']
+    + [(" ,", ","), ("  ", " "), (";", ","), ("…", "."), ("...", ".")],
+    repeat_literals=False,
+    strip=",. ;",
+    max_length=200,
+)
+
+# Lines kept when merging the raw text collection
+MERGE_FILTER = TextNormalizer(
+    length_range=(13, 200),
+    rejected=r'[-;>>*"”“…)\[\]\'’+_]',
+    alphabet=VIETNAMESE_CHARS,
+    min_alphabet_share=0.25,
+)
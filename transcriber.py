@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from adaptive_executor import AIMDController, run_adaptive
+
+TRANSCRIPT_CACHE_PATH = "cache/transcripts.sqlite"
+# Syllables the fake backend builds its deterministic transcripts from
+FAKE_WORDS = (
+    "tôi bạn chúng ta người việt nam hôm nay trời đẹp quá đi chơi công viên "
+    "với học sinh trường được những một hai ba năm của và là có không"
+).split()
+
+
+class TranscriptionError(Exception):
+    """A transcription that failed but may succeed if tried again."""
+
+
+def audio_digest(path):
+    # SHA-256 of the file, so renamed or re-exported identical chunks share it
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GoogleBackend:
+    """
+    Google's speech recognition API through speech_recognition. A chunk with
+    no recognizable speech gives "", a failed request a TranscriptionError.
+    """
+
+    def __init__(self, language="vi-VN"):
+        self.language = language
+        self.signature = f"google:{language}"
+
+    def transcribe(self, path):
+        import speech_recognition as sr  # Only this backend needs it
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(path) as source:
+            audio_data = recognizer.record(source)
+        try:
+            return recognizer.recognize_google(audio_data, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise TranscriptionError(str(e)) from e
+
+
+class FakeBackend:
+    """
+    Local stand-in for tests and benchmarks. The transcript of a chunk is a
+    fixed function of its audio hash; each call sleeps around latency
+    seconds and fails with failure_rate, decided by the seed, the hash and
+    how many times that chunk was tried, so runs repeat exactly.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.signature = "fake"
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def transcribe(self, path):
+        digest = audio_digest(path)
+        with self.lock:
+            attempt = self.calls[digest]
+            self.calls[digest] += 1
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        time.sleep(self.latency * (0.5 + rng.random()))
+        if rng.random() < self.failure_rate:
+            raise TranscriptionError(f"Fake failure on attempt {attempt + 1}")
+        words = random.Random(digest)
+        return " ".join(words.choices(FAKE_WORDS, k=words.randint(5, 20)))
+
+
+class TranscriptCache:
+    """
+    Transcripts in SQLite keyed by (audio hash, backend signature), so a
+    chunk is only sent once per backend and language. Safe to share between
+    threads.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                digest TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (digest, backend)
+            )
+            """)
+        self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get(self, digest, backend):
+        # Cached transcript, or None on a miss
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT text FROM transcripts WHERE digest = ? AND backend = ?",
+                (digest, backend),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, digest, backend, text):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)",
+                (digest, backend, text, time.time()),
+            )
+            self.connection.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute(
+                "SELECT COUNT(*) FROM transcripts"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries[0]}
+
+
+def transcribe_with_retry(backend, path, retries=3, backoff=1.0):
+    # Retries TranscriptionError only; unreadable audio fails straight away
+    for attempt in range(retries):
+        try:
+            return backend.transcribe(path)
+        except TranscriptionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2**attempt * (0.5 + random.random()))
+
+
+def transcribe_chunks(
+    paths, backend, cache=None, workers=16, retries=3, backoff=1.0, on_result=None
+):
+    """
+    Transcribes chunk files on a thread pool of at most workers calls in
+    flight, fewer while the backend errors or slows down. Each chunk is
+    retried up to retries times and looked up in the cache by its audio hash
+    first. on_result(path, text, error) runs on the calling thread. Returns
+    (transcripts in the order of paths, None for the failed ones, the
+    ThroughputMeter).
+    """
+    paths = list(paths)
+    results = {}
+
+    def transcribe_one(index, path):
+        digest = audio_digest(path) if cache else None
+        text = cache.get(digest, backend.signature) if cache else None
+        if text is None:
+            text = transcribe_with_retry(backend, path, retries, backoff)
+            if cache:
+                cache.put(digest, backend.signature, text)
+        results[index] = text
+
+    def finished(item, ok, error):
+        index, path = item
+        if not ok:
+            results[index] = None
+        if on_result:
+            on_result(path, results[index], error)
+
+    controller = AIMDController(initial=workers, max_limit=workers)
+    meter = run_adaptive(transcribe_one, enumerate(paths), controller, None, finished)
+    return [results[index] for index in range(len(paths))], meter
+
+
+def write_transcripts(paths, texts, output_path):
+    # "<chunk path> <text>" lines, as utils.process_text_to_audio_chunks reads
+    with open(output_path, "w", encoding="utf-8") as f:
+        for path, text in zip(paths, texts):
+            if text:
+                f.write(f"{path} {text}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Transcribe speech chunk WAV files in parallel."
+    )
+    parser.add_argument("chunk_dir")
+    parser.add_argument("output")
+    parser.add_argument("--backend", choices=["google", "fake"], default="google")
+    parser.add_argument("--language", default="vi-VN")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--cache", default=TRANSCRIPT_CACHE_PATH)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="Fake backend seconds per call"
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        backend = FakeBackend(args.latency, args.failure_rate)
+    else:
+        backend = GoogleBackend(args.language)
+    cache = None if args.no_cache else TranscriptCache(args.cache)
+
+    paths = sorted(
+        os.path.join(args.chunk_dir, name)
+        for name in os.listdir(args.chunk_dir)
+        if name.endswith(".wav")
+    )
+
+    def on_result(path, text, error):
+        if error:
+            print(f"Failed to transcribe {path}: {error}")
+
+    texts, meter = transcribe_chunks(
+        paths, backend, cache, args.workers, args.retries, on_result=on_result
+    )
+    write_transcripts(paths, texts, args.output)
+    print(meter.report())
+    if cache:
+        print(f"Transcript cache: {cache.stats()}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalize_tts_text(text):
+    # Texts that only differ in Unicode composition or spacing sound the same
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def tts_cache_key(text, voice_code, speed_rate, sample_rate):
+    material = "\x1f".join(
+        [
+            normalize_tts_text(text),
+            voice_code,
+            repr(float(speed_rate)),
+            str(sample_rate),
+        ]
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def place_file(source, destination):
+    # Hard link when possible so a cached clip costs no extra disk space
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized clips keyed by the hash of
+    (normalized text, voice code, speed rate, sample rate). Entries live under
+    directory/<2 hex chars>/<hash>.wav and are evicted least recently used
+    first once the store grows past max_bytes. Safe to share between threads.
+    """
+
+    def __init__(self, directory, max_bytes=20 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+        self.connection.commit()
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".wav")
+
+    def fetch(self, key, destination):
+        """
+        Places the cached clip for key at destination. Returns False on a miss.
+        """
+        path = self.entry_path(key)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return False
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+        place_file(path, destination)
+        return True
+
+    def store(self, key, source):
+        """
+        Adds a synthesized clip to the cache, then evicts the least recently
+        used entries until the cache fits in max_bytes.
+        """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        place_file(source, path)
+        size = os.path.getsize(path)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            self.total_bytes += size - (row[0] if row else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        cursor = self.connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        )
+        evicted = []
+        for key, size in cursor:
+            if self.total_bytes <= self.max_bytes:
+                break
+            path = self.entry_path(key)
+            if os.path.exists(path):
+                os.remove(path)
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries[0],
+            "bytes": self.total_bytes,
+        }
@@ -0,0 +1,3 @@
+# Format of the clips requested from the TTS API. Kept apart from utils_vbee so
+# modules that only check clips (audio_qc) don't import its HTTP client.
+TTS_SAMPLE_RATE = 22050
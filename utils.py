@@ -1,20 +1,27 @@
 """ Filename: utils.py - Directory: ./ """
 
 # Import necessary libraries
-from pytube import YouTube  # To handle downloading from YouTube
-import ffmpeg  # For converting video to audio
-import speech_recognition as sr  # For converting speech to text
+# pytube, ffmpeg, pydub, numpy and soundfile are imported inside the functions
+# that use them, so the text helpers load without them
 import time  # To calculate process duration
 import os  # For file path operations and file deletion
-from pydub import AudioSegment  # For audio manipulation
-import soundfile as sf  # For handling WAV file sample rates
+from transcriber import (  # For transcribing speech chunks in parallel
+    TRANSCRIPT_CACHE_PATH,
+    GoogleBackend,
+    TranscriptCache,
+    transcribe_chunks,
+    write_transcripts,
+)
 
 
 def download_youtube_audio_as_wav(url, output_dir, filename):
     """
-    Downloads and converts a YouTube video's audio stream to a WAV file
-    and removes the intermediary MP4 file.
+    Decodes a YouTube video's audio stream straight to a WAV file, with no
+    intermediary MP4 on disk.
     """
+    from pytube import YouTube  # To handle downloading from YouTube
+    import ffmpeg  # For converting video to audio
+
     # Create a YouTube object with the URL
     yt = YouTube(url)
 
@@ -24,91 +31,80 @@ def download_youtube_audio_as_wav(url, output_dir, filename):
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
-    # Define the path to the downloaded MP4 file
-    mp4_path = os.path.join(output_dir, filename + ".mp4")
-
-    # Download the audio stream as MP4
-    audio_stream.download(output_path=output_dir, filename=filename + ".mp4")
-
     # Define the path for the output WAV file
     wav_path = os.path.join(output_dir, filename + ".wav")
 
-    # Convert MP4 to WAV using ffmpeg
-    ffmpeg.input(mp4_path).output(wav_path).run(overwrite_output=True)
-
-    # Delete the MP4 file after conversion to free up space
-    os.remove(mp4_path)
+    # ffmpeg reads the stream URL itself and decodes it while it downloads
+    ffmpeg.input(audio_stream.url).output(wav_path).run(overwrite_output=True)
 
 
 def convert_audio(input_path, output_path, target_sample_rate=22050):
     """
     Converts an audio file to a specific sample rate and format (WAV),
-    handling mono conversion if necessary.
+    handling mono conversion if necessary. For many files use
+    audio_resample.convert_files, which spreads them over processes.
     """
-    # Load the original WAV file
-    original_audio = AudioSegment.from_file(input_path, format="wav")
+    from audio_resample import convert_file  # For resampling WAV files
 
-    # Convert to mono if stereo and set the target sample rate
-    mono_audio = original_audio.set_channels(1)
-    converted_audio = mono_audio.set_frame_rate(target_sample_rate)
+    # Read once, downmix and resample in numpy, write once
+    convert_file(input_path, output_path, target_sample_rate)
+    print(f"Audio successfully converted to {target_sample_rate} Hz.")
 
-    # Export the converted file
-    converted_audio.export(output_path, format="wav")
 
-    # Verify and fix the sample rate using soundfile if necessary
-    data, sample_rate = sf.read(output_path)
-    if sample_rate != target_sample_rate:
-        # Correct the sample rate and rewrite if incorrect
-        sf.write(output_path, data, target_sample_rate)
-        print(f"Fixed the sample rate to {target_sample_rate} Hz.")
-    else:
-        print(f"Audio successfully converted to {target_sample_rate} Hz.")
-
-
-def transcribe_audio(audio_file_path, output_text_file):
+def transcribe_audio(
+    audio_file_path,
+    output_text_file,
+    backend=None,
+    workers=16,
+    cache_path=TRANSCRIPT_CACHE_PATH,
+):
     """
-    Transcribes audio from a file to text using Google's speech recognition API.
+    Splits an audio file into speech chunks and transcribes them in parallel
+    (with Google's speech recognition API unless another backend is given).
+    Writes one "<chunk path> <text>" line per chunk to output_text_file.
     """
-    # Initialize recognizer
-    r = sr.Recognizer()
-
     # Start time for process estimation
     start_time = time.time()
 
-    # Load the audio file
-    with sr.AudioFile(audio_file_path) as source:
-        print("Processing audio file...")
-        audio_data = r.record(source)  # Load audio to memory for processing
-
-    try:
-        # Recognize speech using Google's speech recognition
-        print("Transcribing audio...")
-        text = r.recognize_google(audio_data, language="vi-VN")
-        with open(output_text_file, "w", encoding="utf-8") as file:
-            file.write(text)
-        print("Transcription complete and saved to", output_text_file)
-    except sr.UnknownValueError:
-        print("Google Speech Recognition could not understand audio")
-    except sr.RequestError as e:
-        print(f"Could not request results from Google Speech Recognition service; {e}")
+    # Chunks go to a folder next to the transcript
+    name = os.path.splitext(os.path.basename(audio_file_path))[0]
+    chunk_folder = os.path.join(
+        os.path.dirname(output_text_file) or ".", f"{name}_chunks"
+    )
+    print("Processing audio file...")
+    # The whole recording is transcribed, intro included
+    chunk_paths = extract_speech_chunks(
+        audio_file_path, chunk_folder, name, skip_intro=False
+    )
+
+    # Transcribe the chunks concurrently, skipping those cached by audio hash
+    print(f"Transcribing {len(chunk_paths)} chunks...")
+    cache = TranscriptCache(cache_path) if cache_path else None
+
+    def on_result(path, text, error):
+        if error:
+            print(f"Could not transcribe {path}: {error}")
+
+    texts, meter = transcribe_chunks(
+        chunk_paths, backend or GoogleBackend(), cache, workers, on_result=on_result
+    )
+    write_transcripts(chunk_paths, texts, output_text_file)
+    if cache:
+        cache.close()
+    print("Transcription complete and saved to", output_text_file)
+    print(meter.report())
 
     # End time for process duration estimation
     end_time = time.time()
     print(f"Process completed in {end_time - start_time:.2f} seconds.")
 
 
-import re
-import os
+from text_normalizer import TRANSCRIPT
 
 
 def clean_text(text):
-    # Remove unwanted unicode characters (adjust pattern as needed)
-    clean_text = re.sub(r"[^\w\s.,'!?]+", "", text)
-
-    # Normalize multiple spaces into single spaces
-    clean_text = re.sub(r"\s+", " ", clean_text)
-
-    return clean_text.strip()  # Remove extra leading/trailing whitespace
+    # Drop symbols other than basic punctuation and collapse whitespace
+    return TRANSCRIPT.normalize(text)
 
 
 def process_text_to_audio_chunks(file_path):
@@ -156,9 +152,6 @@ def process_text_to_audio_chunks(file_path):
 
 #     print(f"Processed text has been saved to {output_file_path}")
 
-from pydub import AudioSegment
-import os
-
 
 def is_silence_chunk(dB_levels, min_len=500, max_len=5000, avg_dB_thresh=-20):
     """Check if the dB level list represents a silence chunk."""
@@ -207,38 +200,39 @@ def extract_speech_chunks(
     silence_thresh=-25,
     min_length=4000,
     max_length=15000,
+    streaming=False,
+    skip_intro=True,
 ):
+    # skip_intro drops the first 6 s of the first chunk (see chunk_export_range);
+    # turn it off to keep the whole recording
+    from pydub import AudioSegment
+
+    from utils_audio import (
+        chunk_export_range,
+        detect_speech_chunks,
+        export_audio_slice,
+        stream_speech_chunks,
+    )
+
+    if streaming:
+        # Block-wise WAV processing with flat memory use for multi-hour sources
+        return stream_speech_chunks(
+            file_path,
+            output_folder,
+            output_file_name,
+            min_silence_len=min_silence_len,
+            silence_thresh=silence_thresh,
+            min_length=min_length,
+            max_length=max_length,
+            skip_intro=skip_intro,
+        )
+
     audio = AudioSegment.from_file(file_path)
-    silence_start = None
-    dB_levels = []
-    speech_chunks = []
-    last_speech_end = 0
-
-    for i in range(0, len(audio), 1):  # Analyze every 1 ms
-        segment = audio[i : i + 1]
-        dB = segment.dBFS
-
-        if dB < silence_thresh:  # Potential silence
-            if silence_start is None:  # Mark the start of a silence segment
-                silence_start = i
-            dB_levels.append(dB)
-        else:
-            if silence_start is not None:
-                # Evaluate the potential silence chunk
-                if is_silence_chunk(
-                    dB_levels, min_len=min_silence_len, avg_dB_thresh=silence_thresh
-                ):
-                    # If it's silence, save the previous speech chunk
-                    if last_speech_end < silence_start:
-                        speech_chunks.append((last_speech_end, silence_start))
-                    last_speech_end = i
-                # Reset for next potential silence segment
-                silence_start = None
-                dB_levels = []
-
-    # Check for a final speech chunk
-    if last_speech_end < len(audio):
-        speech_chunks.append((last_speech_end, len(audio)))
+
+    # Detect speech between silences on the decoded sample array in one pass
+    speech_chunks = detect_speech_chunks(
+        audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh
+    )
 
     # Segment or merge speech chunks to ensure they fit within the desired length range
     speech_chunks = segment_chunks(
@@ -249,19 +243,19 @@ def extract_speech_chunks(
     os.makedirs(output_folder, exist_ok=True)
 
     # Export the speech chunks
+    chunk_paths = []
     for index, (start, end) in enumerate(speech_chunks, start=1):
-        if index == 1:
-            # For the first chunk, extend the end by 200 but don't change the start
-            chunk = audio[start + 6000 : end + 300]
-        elif index == len(speech_chunks):
-            # For the last chunk, extend the start by 200 but don't extend the end
-            chunk = audio[start - 300 : end]
-        else:
-            # For all other chunks, extend both start and end by 200
-            chunk = audio[start - 300 : end + 300]
+        # The first chunk may skip its first 6 s, the others keep 300 ms of context
+        start, end = chunk_export_range(
+            index, start, end, index == len(speech_chunks), skip_intro
+        )
 
         chunk_name = os.path.join(
             output_folder, f"{output_file_name}_chunk_{index}.wav"
         )
-        chunk.export(chunk_name, format="wav")
+        # Write straight from the decoded buffer instead of slicing and exporting
+        export_audio_slice(audio, start, end, chunk_name)
+        chunk_paths.append(chunk_name)
         print(f"Exported {chunk_name}")
+
+    return chunk_paths
@@ -0,0 +1,553 @@
+""" Filename: utils_audio.py - Directory: ./ """
+
+import os  # For file path operations
+import struct  # For parsing WAV headers
+import wave  # For writing WAV headers around raw PCM buffers
+import numpy as np  # For vectorized frame-energy computation
+import soundfile as sf  # For block-wise WAV reading and writing
+
+# NumPy dtypes matching the signed PCM layouts pydub/audioop operate on
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# Number of 1 ms frames analysed per vectorized block (bounds temporary memory)
+ANALYSIS_BLOCK_MS = 10000
+
+# soundfile read dtype and pydub-equivalent sample width for each WAV subtype
+STREAM_FORMATS = {
+    "PCM_U8": ("int16", 1),
+    "PCM_16": ("int16", 2),
+    "PCM_24": ("int32", 4),
+    "PCM_32": ("int32", 4),
+}
+
+
+def audio_segment_samples(audio):
+    """
+    Returns the interleaved PCM samples of a pydub AudioSegment as a NumPy view
+    over its raw buffer (no copy).
+    """
+    if audio.sample_width not in SAMPLE_DTYPES:
+        raise ValueError(f"Unsupported sample width: {audio.sample_width} bytes")
+    return np.frombuffer(audio.raw_data, dtype=SAMPLE_DTYPES[audio.sample_width])
+
+
+def frame_dbfs(samples, frame_rate, channels, sample_width, total_ms=None, start_ms=0):
+    """
+    Computes the dBFS level of every 1 ms window of interleaved PCM samples,
+    from start_ms (the first sample's position) up to total_ms.
+    Window boundaries, RMS rounding and zero padding of the last window follow
+    pydub's `audio[i:i + 1].dBFS`, so the levels are identical to the slow loop.
+    """
+    base = int(start_ms * frame_rate / 1000.0) * channels
+    frame_count = len(samples) // channels
+    if total_ms is None:
+        total_ms = round(1000 * ((base // channels + frame_count) / frame_rate))
+    max_amplitude = float(2 ** (sample_width * 8)) / 2
+
+    dB_levels = np.empty(total_ms - start_ms, dtype=np.float64)
+    for block_start in range(start_ms, total_ms, ANALYSIS_BLOCK_MS):
+        block_end = min(block_start + ANALYSIS_BLOCK_MS, total_ms)
+
+        # Frame offsets of each millisecond, as pydub's frame_count(ms=...) computes them
+        edges = (np.arange(block_start, block_end + 1) * frame_rate / 1000.0).astype(
+            np.int64
+        )
+        lo, hi = edges[0] * channels - base, edges[-1] * channels - base
+        # Float64 sums of squares stay exact for 8/16-bit windows, as in audioop
+        squares = np.zeros(hi - lo, dtype=np.float64)
+        available = samples[lo:hi]
+        squares[: len(available)] = available  # pydub pads a short window with silence
+        np.square(squares, out=squares)
+
+        counts = np.diff(edges) * channels
+        starts = (edges[:-1] - edges[0]) * channels
+        nonempty = counts > 0
+        sums = np.zeros(len(counts), dtype=np.float64)
+        if len(squares):
+            sums[nonempty] = np.add.reduceat(squares, starts[nonempty])
+
+        rms = np.zeros(len(counts), dtype=np.float64)
+        rms[nonempty] = np.floor(np.sqrt(sums[nonempty] / counts[nonempty]))
+        with np.errstate(divide="ignore"):
+            dB_levels[block_start - start_ms : block_end - start_ms] = np.where(
+                rms > 0, 20 * (np.log(rms / max_amplitude) / np.log(10)), -np.inf
+            )
+    return dB_levels
+
+
+def find_speech_intervals(
+    dB_levels, min_silence_len=500, silence_thresh=-25, max_silence_len=5000
+):
+    """
+    Splits a per-millisecond dBFS array into (start, end) speech intervals in ms.
+    A silence run only splits speech when it is followed by sound, lasts between
+    min_silence_len and max_silence_len ms and averages below silence_thresh.
+    """
+    total_ms = len(dB_levels)
+    silent = dB_levels < silence_thresh
+
+    # Locate runs of consecutive silent milliseconds
+    padded = np.concatenate(([False], silent, [False])).astype(np.int8)
+    changes = np.diff(padded)
+    run_starts = np.flatnonzero(changes == 1)
+    run_ends = np.flatnonzero(changes == -1)
+
+    # A run reaching the end of the audio is never closed by sound, so it never counts
+    closed = run_ends < total_ms
+    run_starts, run_ends = run_starts[closed], run_ends[closed]
+
+    speech_chunks = []
+    last_speech_end = 0
+    if len(run_starts):
+        durations = run_ends - run_starts
+        bounds = np.column_stack((run_starts, run_ends)).ravel()
+        run_means = np.add.reduceat(dB_levels, bounds)[::2] / durations
+        is_silence = (
+            (min_silence_len <= durations)
+            & (durations <= max_silence_len)
+            & (run_means < silence_thresh)
+        )
+        for start, end in zip(run_starts[is_silence], run_ends[is_silence]):
+            if last_speech_end < start:
+                speech_chunks.append((last_speech_end, int(start)))
+            last_speech_end = int(end)
+
+    # Check for a final speech chunk
+    if last_speech_end < total_ms:
+        speech_chunks.append((last_speech_end, total_ms))
+    return speech_chunks
+
+
+def detect_speech_chunks(audio, min_silence_len=500, silence_thresh=-25):
+    """
+    Returns the (start, end) speech intervals in ms of a pydub AudioSegment,
+    decoding its samples once and analysing them in bulk.
+    """
+    dB_levels = frame_dbfs(
+        audio_segment_samples(audio),
+        audio.frame_rate,
+        audio.channels,
+        audio.sample_width,
+        total_ms=len(audio),
+    )
+    return find_speech_intervals(
+        dB_levels, min_silence_len=min_silence_len, silence_thresh=silence_thresh
+    )
+
+
+def read_wav_header(path):
+    """
+    Parses the RIFF header of a WAV file without decoding any audio and
+    returns its format, frame count and whether the data chunk is complete.
+    Raises ValueError if the file is not a readable WAV.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        riff = file.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+
+        fmt = None
+        while True:
+            chunk_header = file.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"No data chunk in {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", file.read(16))
+                file.seek(chunk_size - 16 + chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                data_offset = file.tell()
+                break
+            else:
+                file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    if fmt is None:
+        raise ValueError(f"No fmt chunk in {path}")
+    audio_format, channels, sample_rate, _, block_align, bits = fmt
+    available = file_size - data_offset
+    return {
+        "format": audio_format,
+        "channels": channels,
+        "sample_rate": sample_rate,
+        "sample_width": bits // 8,
+        "frames": min(chunk_size, available) // block_align if block_align else 0,
+        "data_size": chunk_size,
+        "complete": available >= chunk_size,
+    }
+
+
+def write_wav(path, frames, frame_rate, channels, sample_width, padding_frames=0):
+    """
+    Writes interleaved PCM frames from any buffer (bytes, memoryview or a
+    contiguous NumPy array) to a WAV file as-is, followed by padding_frames
+    frames of silence. 16/32-bit data is written without being copied.
+    """
+    data = memoryview(frames).cast("B")
+    if sample_width == 1:
+        # WAV stores 8-bit samples unsigned
+        data = memoryview(np.frombuffer(data, dtype=np.uint8) ^ 0x80)
+
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframesraw(data)
+        if padding_frames:
+            silence = b"\x80" if sample_width == 1 else b"\x00"
+            wav_file.writeframesraw(
+                silence * (padding_frames * channels * sample_width)
+            )
+
+
+def export_audio_slice(audio, start, end, path):
+    """
+    Exports audio[start:end] (in ms) of a pydub AudioSegment to a WAV file
+    straight from its decoded buffer, with the same bounds and tail padding
+    as slicing the segment and calling export(format="wav").
+    """
+    length = len(audio)
+    frame_width = audio.frame_width
+    frame_count = int(audio.frame_count())
+
+    def frame_at(ms):
+        ms = min(ms, length)
+        if ms < 0:
+            ms = length - abs(ms)
+        return int(audio.frame_count(ms=ms))
+
+    start_frame, end_frame = frame_at(start), frame_at(end)
+    data = memoryview(audio.raw_data)[
+        start_frame * frame_width : min(end_frame, frame_count) * frame_width
+    ]
+    padding_frames = max(end_frame - start_frame, 0) - len(data) // frame_width
+    write_wav(
+        path,
+        data,
+        audio.frame_rate,
+        audio.channels,
+        audio.sample_width,
+        padding_frames=padding_frames,
+    )
+
+
+def chunk_export_range(index, start, end, is_last, skip_intro=True):
+    """
+    Returns the (start, end) ms range exported for a speech chunk: with
+    skip_intro the first chunk skips its leading 6 s (a channel intro), and
+    the chunks get 300 ms of context on each side except after the last one.
+    """
+    if index == 1 and skip_intro:
+        return start + 6000, end + 300
+    if index == 1:
+        start = max(start, 300)  # A negative start counts from the end
+    if is_last:
+        return start - 300, end
+    return start - 300, end + 300
+
+
+class StreamingSpeechChunker:
+    """
+    Incremental form of the silence detection and segment_chunks rules used by
+    extract_speech_chunks. Per-millisecond dBFS blocks are fed in order and the
+    chunks whose boundaries can no longer change are handed back for export.
+    """
+
+    def __init__(
+        self,
+        min_silence_len=500,
+        silence_thresh=-25,
+        min_length=4000,
+        max_length=15000,
+        max_silence_len=5000,
+    ):
+        self.min_silence_len = min_silence_len
+        self.silence_thresh = silence_thresh
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_silence_len = max_silence_len
+
+        # Silence detector state carried across blocks
+        self.last_speech_end = 0
+        self.silence_start = None
+        self.silence_sum = 0.0
+        self.position = 0
+
+        # Segmenter state: split segments already taken from the open speech
+        # interval, the last chunk (still mergeable) and finalised chunks
+        self.split_count = 0
+        self.pending = None
+        self.chunk_count = 0
+        self.ready = []
+
+    def feed(self, dB_levels):
+        """
+        Consumes the next block of per-millisecond dBFS levels and returns the
+        finalised chunks as (index, start, end, is_last) tuples.
+        """
+        offset = self.position
+        silent = dB_levels < self.silence_thresh
+        in_silence = self.silence_start is not None
+        changes = np.flatnonzero(
+            np.diff(np.concatenate(([in_silence], silent)).astype(np.int8))
+        )
+
+        run_from = 0
+        for i in changes:
+            if self.silence_start is None:
+                # Mark the start of a potential silence segment
+                self.silence_start = offset + int(i)
+                self.silence_sum = 0.0
+                run_from = i
+            else:
+                self.silence_sum += float(dB_levels[run_from:i].sum())
+                self._end_silence(offset + int(i))
+        if self.silence_start is not None:
+            self.silence_sum += float(dB_levels[run_from:].sum())
+        self.position = offset + len(dB_levels)
+
+        # The open speech interval lasts at least until an open silence that may
+        # still qualify, so segments that far in are final
+        extent = self.position
+        if (
+            self.silence_start is not None
+            and self.position - self.silence_start <= self.max_silence_len
+        ):
+            extent = self.silence_start
+        while extent > self._split_start() + self.max_length:
+            split_start = self._split_start()
+            self._append((split_start, split_start + self.max_length))
+            self.split_count += 1
+
+        return self._drain()
+
+    def finish(self):
+        """
+        Closes the final speech interval at the end of the audio and returns the
+        remaining chunks, the last one flagged as such.
+        """
+        if self.last_speech_end < self.position:
+            self._close_interval(self.position)
+        if self.pending is not None:
+            self._emit(self.pending, is_last=True)
+            self.pending = None
+        return self._drain()
+
+    def keep_from(self):
+        """
+        Returns the earliest millisecond any unexported chunk can still need.
+        """
+        keep = self._split_start()
+        if self.pending is not None:
+            keep = min(keep, self.pending[0])
+        return max(keep - 300, 0)
+
+    def _split_start(self):
+        return self.last_speech_end + self.split_count * self.max_length
+
+    def _end_silence(self, sound_start):
+        duration = sound_start - self.silence_start
+        if (
+            self.min_silence_len <= duration <= self.max_silence_len
+            and self.silence_sum / duration < self.silence_thresh
+        ):
+            # If it's silence, close the previous speech interval
+            if self.last_speech_end < self.silence_start:
+                self._close_interval(self.silence_start)
+            self.last_speech_end = sound_start
+            self.split_count = 0
+        self.silence_start = None
+
+    def _close_interval(self, end):
+        start = self.last_speech_end
+        if self.split_count:
+            # Already known to be too long: emit the rest of its segments
+            for segment_start in range(self._split_start(), end, self.max_length):
+                self._append((segment_start, min(segment_start + self.max_length, end)))
+            return
+
+        chunk_length = end - start
+        if chunk_length < self.min_length:
+            if (
+                self.pending is not None
+                and (self.pending[1] - self.pending[0] + chunk_length)
+                <= self.max_length
+            ):
+                # Merge with the previous chunk if the total length is within the limit
+                self.pending = (self.pending[0], end)
+            else:
+                self._append((start, end))
+        elif chunk_length > self.max_length:
+            for segment_start in range(start, end, self.max_length):
+                self._append((segment_start, min(segment_start + self.max_length, end)))
+        else:
+            self._append((start, end))
+
+    def _append(self, chunk):
+        # A chunk followed by another can neither be merged nor be the last one
+        if self.pending is not None:
+            self._emit(self.pending, is_last=False)
+        self.pending = chunk
+
+    def _emit(self, chunk, is_last):
+        self.chunk_count += 1
+        self.ready.append((self.chunk_count, chunk[0], chunk[1], is_last))
+
+    def _drain(self):
+        ready, self.ready = self.ready, []
+        return ready
+
+
+def stream_speech_chunks(
+    file_path,
+    output_folder,
+    output_file_name,
+    min_silence_len=500,
+    silence_thresh=-25,
+    min_length=4000,
+    max_length=15000,
+    block_ms=ANALYSIS_BLOCK_MS,
+    skip_intro=True,
+):
+    """
+    Streaming counterpart of extract_speech_chunks for WAV input: reads the file
+    in fixed-size blocks, writes each chunk as soon as it is final and only
+    keeps the samples of unexported chunks, so memory does not grow with the
+    length of the recording. Returns the exported chunk paths.
+    """
+    with sf.SoundFile(file_path) as source:
+        frame_rate = source.samplerate
+        dtype, sample_width = STREAM_FORMATS.get(source.subtype, ("int16", 2))
+        total_ms = round(1000 * (source.frames / frame_rate))
+
+        def blocks():
+            for block_start in range(0, total_ms, block_ms):
+                block_end = min(block_start + block_ms, total_ms)
+                block = source.read(
+                    block_frames(block_start, block_end, frame_rate),
+                    dtype=dtype,
+                    always_2d=True,
+                )
+                if sample_width == 1:
+                    # soundfile scales 8-bit samples to int16; pydub keeps them signed 8-bit
+                    block = (block >> 8).astype(np.int8)
+                yield block
+
+        return chunk_pcm_blocks(
+            blocks(),
+            frame_rate,
+            sample_width,
+            output_folder,
+            output_file_name,
+            min_silence_len=min_silence_len,
+            silence_thresh=silence_thresh,
+            min_length=min_length,
+            max_length=max_length,
+            block_ms=block_ms,
+            skip_intro=skip_intro,
+        )
+
+
+def block_frames(block_start, block_end, frame_rate):
+    """
+    Number of frames from block_start to block_end ms, the same split of the
+    audio into blocks whatever it is read from.
+    """
+    return int(block_end * frame_rate / 1000.0) - int(block_start * frame_rate / 1000.0)
+
+
+def chunk_pcm_blocks(
+    blocks,
+    frame_rate,
+    sample_width,
+    output_folder,
+    output_file_name,
+    min_silence_len=500,
+    silence_thresh=-25,
+    min_length=4000,
+    max_length=15000,
+    block_ms=ANALYSIS_BLOCK_MS,
+    skip_intro=True,
+):
+    """
+    Detects and exports speech chunks from consecutive PCM blocks shaped
+    (frames, channels), each block_frames() of block_ms long except the last,
+    which may be shorter. The total length need not be known up front, so the
+    blocks can come from a pipe. skip_intro is passed to chunk_export_range.
+    Returns the exported chunk paths.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    chunk_paths = []
+    chunker = StreamingSpeechChunker(
+        min_silence_len=min_silence_len,
+        silence_thresh=silence_thresh,
+        min_length=min_length,
+        max_length=max_length,
+    )
+
+    def frame_at(ms):
+        return int(ms * frame_rate / 1000.0)
+
+    buffer = None
+    buffer_start = 0  # Frame index of buffer[0]
+    received = 0
+    total_ms = None  # Known once the last block is in
+
+    def export(chunks):
+        for index, start, end, is_last in chunks:
+            start, end = chunk_export_range(index, start, end, is_last, skip_intro)
+            if total_ms is not None:
+                start, end = min(start, total_ms), min(end, total_ms)
+            start = frame_at(max(start, 0)) - buffer_start
+            end = frame_at(max(end, 0)) - buffer_start
+            chunk = buffer[start:end].ravel()
+            chunk_name = os.path.join(
+                output_folder, f"{output_file_name}_chunk_{index}.wav"
+            )
+            # Pad the tail of the file with silence, as pydub slicing does
+            write_wav(
+                chunk_name,
+                chunk,
+                frame_rate,
+                channels,
+                sample_width,
+                padding_frames=max(end - start, 0) - len(chunk) // channels,
+            )
+            chunk_paths.append(chunk_name)
+            print(f"Exported {chunk_name}")
+
+    blocks = iter(blocks)
+    block = next(blocks, None)
+    block_start = 0
+    while block is not None:
+        # One block of lookahead tells whether this one ends the audio
+        following = next(blocks, None)
+        received += len(block)
+        if following is None:
+            total_ms = round(1000 * (received / frame_rate))
+            block_end = total_ms
+        else:
+            block_end = block_start + block_ms
+
+        channels = block.shape[1]
+        buffer = block if buffer is None else np.concatenate((buffer, block))
+        dB_levels = frame_dbfs(
+            block.ravel(),
+            frame_rate,
+            channels,
+            sample_width,
+            total_ms=block_end,
+            start_ms=block_start,
+        )
+        export(chunker.feed(dB_levels))
+
+        # Drop samples no remaining chunk can reach
+        keep_frame = frame_at(chunker.keep_from())
+        buffer = buffer[max(keep_frame - buffer_start, 0) :]
+        buffer_start = max(keep_frame, buffer_start)
+        block, block_start = following, block_end
+
+    if buffer is not None:
+        export(chunker.finish())
+
+    return chunk_paths
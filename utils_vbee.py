@@ -1,67 +1,294 @@
 import time
 import os
+import json
+import struct
+import asyncio
+import hmac
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 import requests
 from dotenv import load_dotenv
 
+from tts_format import TTS_SAMPLE_RATE
+from utils_audio import read_wav_header
+
+VBEE_API_URL = "https://vbee.vn/api/v1/tts"
+VBEE_APP_ID = "20aead61-13a3-4e2c-a0d8-096231eb3cc7"
+DEFAULT_CALLBACK_URL = "https://mydomain/callback"
+
 
 def load_api_key():
     load_dotenv()
     return os.getenv("VBEE_API_KEY")
 
 
-def send_tts_request(api_key, input_text, voice_code, speed_rate):
-    post_url = "https://vbee.vn/api/v1/tts"
-    payload = {
-        "app_id": "20aead61-13a3-4e2c-a0d8-096231eb3cc7",
+def build_tts_payload(
+    input_text, voice_code, speed_rate, callback_url=DEFAULT_CALLBACK_URL
+):
+    return {
+        "app_id": VBEE_APP_ID,
         "response_type": "indirect",
-        "callback_url": "https://mydomain/callback",
+        "callback_url": callback_url,
         "input_text": input_text,
         "voice_code": voice_code,
         "audio_type": "wav",
         "bitrate": 128,
         "speed_rate": speed_rate,
-        "sample_rate": 22050,
+        "sample_rate": TTS_SAMPLE_RATE,
     }
+
+
+def send_tts_request(
+    api_key,
+    input_text,
+    voice_code,
+    speed_rate,
+    api_url=VBEE_API_URL,
+    callback_url=DEFAULT_CALLBACK_URL,
+):
+    payload = build_tts_payload(input_text, voice_code, speed_rate, callback_url)
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    response = requests.post(post_url, headers=headers, json=payload, timeout=20)
+    response = requests.post(api_url, headers=headers, json=payload, timeout=20)
     return response.json()
 
 
-def check_tts_status(api_key, request_id, input_text_length):
-    get_url = f"https://vbee.vn/api/v1/tts/{request_id}"
+def parse_tts_result(result):
+    # Audio link of a finished job, None while it is still running
+    if result.get("status") == "SUCCESS":
+        return result["audio_link"]
+    elif result.get("status") == "FAILED":
+        raise Exception("Text-to-Speech conversion failed.")
+    return None
+
+
+class CallbackListener:
+    """
+    Local HTTP server that receives Vbee completion callbacks and hands them to
+    whoever waits on the matching request_id. Notifications arriving before
+    anyone waits are kept until they are claimed. Only loopback is listened
+    on unless another host is given, and posts must carry the listener's
+    token (the token query parameter of callback_url, or an X-Callback-Token
+    header); any other post is refused with 403.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, public_url=None, token=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.token = token or secrets.token_urlsafe(24)
+        self.results = {}
+        self.waiters = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def callback_url(self):
+        url = self.public_url or f"http://{self.host}:{self.port}/callback"
+        separator = "&" if urlsplit(url).query else "?"
+        return f"{url}{separator}token={self.token}"
+
+    def authorized(self, path, headers):
+        query = parse_qs(urlsplit(path).query)
+        token = headers.get("X-Callback-Token") or query.get("token", [""])[0]
+        return hmac.compare_digest(token.encode(), self.token.encode())
+
+    def start(self):
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not listener.authorized(self.path, self.headers):
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                try:
+                    payload = json.loads(body)
+                    listener.notify(payload.get("result", payload))
+                    self.send_response(200)
+                except (ValueError, AttributeError):
+                    self.send_response(400)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def notify(self, result):
+        request_id = result.get("request_id")
+        if request_id is None:
+            return
+        with self.lock:
+            waiters = self.waiters.pop(request_id, None)
+            if not waiters:
+                self.results[request_id] = result
+        for waiter in waiters or []:
+            waiter(result)
+
+    def _register(self, request_id, waiter):
+        # Returns an already received result instead of registering the waiter
+        with self.lock:
+            if request_id in self.results:
+                return self.results.pop(request_id)
+            self.waiters.setdefault(request_id, []).append(waiter)
+        return None
+
+    def _unregister(self, request_id, waiter):
+        with self.lock:
+            waiters = self.waiters.get(request_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self.waiters.pop(request_id, None)
+
+    def wait(self, request_id, timeout):
+        # Blocks until the callback for request_id arrives, None on timeout
+        event = threading.Event()
+        received = []
+
+        def waiter(result):
+            received.append(result)
+            event.set()
+
+        result = self._register(request_id, waiter)
+        if result is not None:
+            return result
+        event.wait(timeout)
+        self._unregister(request_id, waiter)
+        return received[0] if received else None
+
+    async def wait_async(self, request_id, timeout):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_result(result):
+            if not future.done():
+                future.set_result(result)
+
+        def waiter(result):
+            loop.call_soon_threadsafe(set_result, result)
+
+        result = self._register(request_id, waiter)
+        if result is not None:
+            return result
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._unregister(request_id, waiter)
+
+
+def check_tts_status(
+    api_key,
+    request_id,
+    input_text_length,
+    api_url=VBEE_API_URL,
+    listener=None,
+    max_wait=120,
+):
+    get_url = f"{api_url}/{request_id}"
     headers = {"Authorization": f"Bearer {api_key}"}
 
     # Calculate initial wait time based on the number of characters in the input text
     initial_wait_time = input_text_length * 0.03
-    print(
-        f"Waiting {initial_wait_time} seconds before starting to poll for TTS status."
-    )
-    time.sleep(initial_wait_time)  # Initial delay before starting the polling
 
-    for _ in range(10):  # Maximum number of retries
-        time.sleep(1)  # Wait for 1 second before each check
+    if listener:
+        # Download as soon as the callback arrives; poll only if it never does
+        result = listener.wait(request_id, timeout=initial_wait_time + 30)
+        if result is not None:
+            audio_link = parse_tts_result(result)
+            if audio_link:
+                return audio_link
+    else:
+        print(
+            f"Waiting {initial_wait_time} seconds before starting to poll for TTS status."
+        )
+        time.sleep(initial_wait_time)  # Initial delay before starting the polling
+
+    # Poll with adaptive backoff until the job finishes or max_wait runs out
+    delay = 0.5
+    deadline = time.time() + max_wait
+    while time.time() < deadline:
+        time.sleep(delay)
         response = requests.get(get_url, headers=headers, timeout=20)
         response_data = response.json()
         if "result" in response_data and "status" in response_data["result"]:
-            if response_data["result"]["status"] == "SUCCESS":
-                return response_data["result"]["audio_link"]
-            elif response_data["result"]["status"] == "FAILED":
-                raise Exception("Text-to-Speech conversion failed.")
-        else:
-            continue
-    raise Exception("Failed to complete the operation within the allowed retries.")
-
-
-def download_audio_file(url, path):
-    response = requests.get(url, timeout=20)
-    if response.status_code == 200:
-        with open(path, "wb") as f:
-            f.write(response.content)
-        print(f"Audio saved successfully at {path}")
-    else:
+            audio_link = parse_tts_result(response_data["result"])
+            if audio_link:
+                return audio_link
+        delay = min(delay * 1.5, 8)
+    raise Exception(f"Failed to complete the operation within {max_wait} seconds.")
+
+
+def validate_audio_file(path, sample_rate=TTS_SAMPLE_RATE, channels=1):
+    # Header-only check that a downloaded clip is a complete WAV in the expected format
+    try:
+        header = read_wav_header(path)
+    except (OSError, ValueError, struct.error) as e:
+        raise Exception(f"Downloaded audio is not a valid WAV file: {e}")
+    if not header["complete"]:
+        raise Exception("Downloaded audio file is truncated.")
+    if header["sample_rate"] != sample_rate or header["channels"] != channels:
         raise Exception(
-            f"Failed to download the audio file: Status Code {response.status_code}"
+            f"Downloaded audio is {header['sample_rate']} Hz / {header['channels']} ch, "
+            f"expected {sample_rate} Hz / {channels} ch."
         )
+    if header["frames"] == 0:
+        raise Exception("Downloaded audio file is empty.")
+    return header
+
+
+def download_audio_file(url, path, sample_rate=TTS_SAMPLE_RATE, channels=1, retries=3):
+    # Stream into a .part file, resuming with a Range request after a dropped
+    # connection, and only move it into place once the WAV header checks out
+    temp_path = path + ".part"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    try:
+        for attempt in range(retries):
+            offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with requests.get(
+                    url, headers=headers, stream=True, timeout=20
+                ) as response:
+                    if response.status_code == 416 and offset:
+                        break  # Everything was already received
+                    if response.status_code not in (200, 206):
+                        raise Exception(
+                            f"Failed to download the audio file: Status Code {response.status_code}"
+                        )
+                    # A 200 means the server ignored the range: start over
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    with open(temp_path, mode) as f:
+                        for data in response.iter_content(chunk_size=65536):
+                            f.write(data)
+                break
+            except requests.RequestException as e:
+                if attempt == retries - 1:
+                    raise Exception(f"Failed to download the audio file: {e}")
+                time.sleep(2**attempt)
+        validate_audio_file(temp_path, sample_rate, channels)
+    except BaseException:
+        # Bad status, failed retries or a bad header: no .part file is left
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    print(f"Audio saved successfully at {path}")
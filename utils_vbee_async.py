@@ -0,0 +1,283 @@
+import asyncio
+import os
+import aiohttp
+
+from tts_cache import tts_cache_key
+from utils_vbee import (
+    DEFAULT_CALLBACK_URL,
+    TTS_SAMPLE_RATE,
+    VBEE_API_URL,
+    build_tts_payload,
+    parse_tts_result,
+    validate_audio_file,
+)
+
+
+class RateLimiter:
+    """Spaces out API calls to at most `rate` per second across all tasks."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        delay = self.next_time - now
+        self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def create_session(concurrency=100, timeout=20):
+    # One pooled session keeps TLS connections alive across every request
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    return aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+    )
+
+
+async def send_tts_request_async(
+    session,
+    api_key,
+    input_text,
+    voice_code,
+    speed_rate,
+    api_url=VBEE_API_URL,
+    limiter=None,
+    callback_url=DEFAULT_CALLBACK_URL,
+):
+    payload = build_tts_payload(input_text, voice_code, speed_rate, callback_url)
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    if limiter:
+        await limiter.wait()
+    async with session.post(api_url, headers=headers, json=payload) as response:
+        return await response.json(content_type=None)
+
+
+async def check_tts_status_async(
+    session,
+    api_key,
+    request_id,
+    input_text_length,
+    api_url=VBEE_API_URL,
+    limiter=None,
+    listener=None,
+    wait_per_char=0.03,
+    poll_interval=0.5,
+    max_poll_interval=8.0,
+    max_wait=120,
+):
+    get_url = f"{api_url}/{request_id}"
+    headers = {"Authorization": f"Bearer {api_key}"}
+    initial_wait_time = input_text_length * wait_per_char
+
+    if listener:
+        # Download as soon as the callback arrives; poll only if it never does
+        result = await listener.wait_async(request_id, timeout=initial_wait_time + 30)
+        if result is not None:
+            audio_link = parse_tts_result(result)
+            if audio_link:
+                return audio_link
+    else:
+        # Same initial delay as check_tts_status, but waiting never blocks a thread
+        await asyncio.sleep(initial_wait_time)
+
+    # Poll with adaptive backoff until the job finishes or max_wait runs out
+    loop = asyncio.get_running_loop()
+    delay = poll_interval
+    deadline = loop.time() + max_wait
+    while loop.time() < deadline:
+        await asyncio.sleep(delay)
+        if limiter:
+            await limiter.wait()
+        async with session.get(get_url, headers=headers) as response:
+            response_data = await response.json(content_type=None)
+        if "result" in response_data and "status" in response_data["result"]:
+            audio_link = parse_tts_result(response_data["result"])
+            if audio_link:
+                return audio_link
+        delay = min(delay * 1.5, max_poll_interval)
+    raise Exception(f"Failed to complete the operation within {max_wait} seconds.")
+
+
+async def download_audio_file_async(
+    session, url, path, limiter=None, sample_rate=TTS_SAMPLE_RATE, channels=1, retries=3
+):
+    # Same streaming, range-resume and header validation as download_audio_file
+    temp_path = path + ".part"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    try:
+        for attempt in range(retries):
+            offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            if limiter:
+                await limiter.wait()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 416 and offset:
+                        break
+                    if response.status not in (200, 206):
+                        raise Exception(
+                            f"Failed to download the audio file: Status Code {response.status}"
+                        )
+                    mode = "ab" if response.status == 206 else "wb"
+                    with open(temp_path, mode) as f:
+                        async for data in response.content.iter_chunked(65536):
+                            f.write(data)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries - 1:
+                    raise Exception(f"Failed to download the audio file: {e}")
+                await asyncio.sleep(2**attempt)
+        validate_audio_file(temp_path, sample_rate, channels)
+    except BaseException:
+        # Bad status, failed retries, bad header or cancellation: no .part left
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+
+async def synthesize_async(
+    session,
+    api_key,
+    input_text,
+    voice_code,
+    speed_rate,
+    path,
+    index=None,
+    api_url=VBEE_API_URL,
+    limiter=None,
+    listener=None,
+    ledger=None,
+    cache=None,
+    **poll_options,
+):
+    """
+    Runs one TTS job end to end: submit, wait for the result, download it.
+    With a cache, a clip already synthesized for the same text and voice is
+    reused without any API call. With a ledger, progress is recorded under
+    (index, voice_code) and a request accepted in an earlier run is resumed
+    instead of submitted again.
+    """
+    # Ledger and cache calls are blocking SQLite and file operations; both are
+    # thread-safe, so they run in worker threads instead of the event loop
+    track = ledger is not None and index is not None
+    if cache:
+        cache_key = tts_cache_key(input_text, voice_code, speed_rate, TTS_SAMPLE_RATE)
+        if await asyncio.to_thread(cache.fetch, cache_key, path):
+            if track:
+                await asyncio.to_thread(ledger.mark_downloaded, index, voice_code, path)
+            return path
+    request_id = (
+        await asyncio.to_thread(ledger.resumable_request_id, index, voice_code)
+        if track
+        else None
+    )
+    try:
+        if request_id is None:
+            callback_url = listener.callback_url if listener else DEFAULT_CALLBACK_URL
+            response_data = await send_tts_request_async(
+                session,
+                api_key,
+                input_text,
+                voice_code,
+                speed_rate,
+                api_url,
+                limiter,
+                callback_url,
+            )
+            if (
+                "result" not in response_data
+                or "request_id" not in response_data["result"]
+            ):
+                raise Exception(
+                    f"Request ID not found. Here's the POST response: {response_data}"
+                )
+            request_id = response_data["result"]["request_id"]
+            if track:
+                await asyncio.to_thread(
+                    ledger.mark_submitted, index, voice_code, request_id
+                )
+
+        audio_url = await check_tts_status_async(
+            session,
+            api_key,
+            request_id,
+            len(input_text),
+            api_url,
+            limiter,
+            listener,
+            **poll_options,
+        )
+        if track:
+            await asyncio.to_thread(ledger.mark_succeeded, index, voice_code, audio_url)
+        await download_audio_file_async(session, audio_url, path, limiter)
+        if cache:
+            await asyncio.to_thread(cache.store, cache_key, path)
+    except Exception as e:
+        if track:
+            await asyncio.to_thread(ledger.mark_failed, index, voice_code, e)
+        raise
+    if track:
+        await asyncio.to_thread(ledger.mark_downloaded, index, voice_code, path)
+    return path
+
+
+async def run_tts_jobs(
+    jobs,
+    api_key,
+    concurrency=100,
+    rate_limit=None,
+    api_url=VBEE_API_URL,
+    on_result=None,
+    listener=None,
+    ledger=None,
+    cache=None,
+    **poll_options,
+):
+    """
+    Runs (input_text, voice_code, speed_rate, path[, index]) jobs with at most
+    `concurrency` in flight and at most `rate_limit` API calls per second.
+    With a CallbackListener, results are taken from its callbacks and polling
+    is only the fallback; with a JobLedger, jobs carrying an index are tracked;
+    with a TTSCache, previously synthesized clips are reused.
+    Jobs are pulled lazily from the iterable; on_result(job, path, error) is
+    called as each one finishes. Returns the (succeeded, failed) counts.
+    """
+    limiter = RateLimiter(rate_limit)
+    counts = {"succeeded": 0, "failed": 0}
+    jobs = iter(jobs)
+
+    async def worker(session):
+        for job in jobs:
+            try:
+                path = await synthesize_async(
+                    session,
+                    api_key,
+                    *job,
+                    api_url=api_url,
+                    limiter=limiter,
+                    listener=listener,
+                    ledger=ledger,
+                    cache=cache,
+                    **poll_options,
+                )
+                error = None
+                counts["succeeded"] += 1
+            except Exception as e:
+                path, error = None, e
+                counts["failed"] += 1
+            if on_result:
+                on_result(job, path, error)
+
+    async with create_session(concurrency) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return counts["succeeded"], counts["failed"]
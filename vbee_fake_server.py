@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import io
+import os
+import random
+import time
+import uuid
+import wave
+
+import aiohttp
+from aiohttp import web
+
+from utils_vbee import DEFAULT_CALLBACK_URL, CallbackListener
+from utils_vbee_async import run_tts_jobs
+
+
+def make_wav_bytes(duration, sample_rate=22050):
+    # Silent 16-bit mono clip standing in for synthesized speech
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"\x00\x00" * int(duration * sample_rate))
+    return buffer.getvalue()
+
+
+def create_app(latency_per_char=0.0, base_latency=0.2, failure_rate=0.0, seed=0):
+    """
+    Local stand-in for the Vbee TTS API: POST /api/v1/tts queues a job that
+    completes after base_latency + latency_per_char * len(text) seconds,
+    GET /api/v1/tts/{request_id} reports its status and GET /audio/{request_id}
+    serves a silent WAV roughly as long as the text would be spoken.
+    Jobs with a reachable callback_url are also POSTed there when they finish.
+    """
+    jobs = {}
+    rng = random.Random(seed)
+    stats = {"posts": 0, "polls": 0, "downloads": 0, "callbacks": 0}
+    tasks = set()
+
+    async def send_callback(request, request_id, callback_url):
+        job = jobs[request_id]
+        await asyncio.sleep(max(job["ready_at"] - time.monotonic(), 0))
+        result = {"request_id": request_id, "status": "SUCCESS"}
+        if job["failed"]:
+            result["status"] = "FAILED"
+        else:
+            result["audio_link"] = f"{request.url.origin()}/audio/{request_id}.wav"
+        async with aiohttp.ClientSession() as session:
+            async with session.post(callback_url, json={"result": result}):
+                stats["callbacks"] += 1
+
+    async def create_job(request):
+        payload = await request.json()
+        stats["posts"] += 1
+        request_id = uuid.uuid4().hex
+        text = payload["input_text"]
+        jobs[request_id] = {
+            "ready_at": time.monotonic() + base_latency + latency_per_char * len(text),
+            "failed": rng.random() < failure_rate,
+            "duration": 0.06 * len(text),
+            "sample_rate": payload.get("sample_rate", 22050),
+        }
+        callback_url = payload.get("callback_url")
+        if callback_url and callback_url != DEFAULT_CALLBACK_URL:
+            task = asyncio.create_task(send_callback(request, request_id, callback_url))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        return web.json_response({"result": {"request_id": request_id}})
+
+    async def job_status(request):
+        stats["polls"] += 1
+        request_id = request.match_info["request_id"]
+        job = jobs.get(request_id)
+        if job is None:
+            return web.json_response({"error": "not found"}, status=404)
+        if time.monotonic() < job["ready_at"]:
+            status = "IN_PROGRESS"
+        else:
+            status = "FAILED" if job["failed"] else "SUCCESS"
+        result = {"request_id": request_id, "status": status}
+        if status == "SUCCESS":
+            result["audio_link"] = f"{request.url.origin()}/audio/{request_id}.wav"
+        return web.json_response({"result": result})
+
+    async def audio(request):
+        stats["downloads"] += 1
+        job = jobs[request.match_info["request_id"]]
+        body = make_wav_bytes(job["duration"], job["sample_rate"])
+        return web.Response(body=body, content_type="audio/wav")
+
+    app = web.Application()
+    app["jobs"] = jobs
+    app["stats"] = stats
+    app.router.add_post("/api/v1/tts", create_job)
+    app.router.add_get("/api/v1/tts/{request_id}", job_status)
+    app.router.add_get("/audio/{request_id}.wav", audio)
+    return app
+
+
+async def start_server(app, host="127.0.0.1", port=0):
+    # Returns the runner (for cleanup) and the base URL of the fake API
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}"
+
+
+async def benchmark(
+    num_jobs, concurrency, rate_limit, output_dir, callback=False, **server_options
+):
+    os.makedirs(output_dir, exist_ok=True)
+    app = create_app(**server_options)
+    runner, base_url = await start_server(app)
+    listener = CallbackListener("127.0.0.1", port=0).start() if callback else None
+    jobs = (
+        (
+            f"Câu thử nghiệm số {index} cho máy chủ giả lập",
+            "hn_female_ngochuyen_full_48k-fhg",
+            1.0,
+            os.path.join(output_dir, f"audio_{index + 1}.wav"),
+        )
+        for index in range(num_jobs)
+    )
+
+    start_time = time.time()
+    try:
+        succeeded, failed = await run_tts_jobs(
+            jobs,
+            "fake-api-key",
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            api_url=f"{base_url}/api/v1/tts",
+            listener=listener,
+            wait_per_char=0.0,
+            poll_interval=0.1,
+            max_wait=30,
+        )
+    finally:
+        await runner.cleanup()
+        if listener:
+            listener.stop()
+    elapsed = time.time() - start_time
+
+    print(f"Jobs: {succeeded} succeeded, {failed} failed in {elapsed:.2f} seconds")
+    print(
+        f"Throughput: {succeeded / elapsed:.1f} clips/s ({succeeded / elapsed * 3600:.0f}/h)"
+    )
+    print(f"Server calls: {app['stats']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the async Vbee client against a local fake server."
+    )
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output-dir", default="wavs/fake_vbee")
+    parser.add_argument(
+        "--callback", action="store_true", help="Receive results via callbacks"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(
+        benchmark(
+            args.jobs,
+            args.concurrency,
+            args.rate_limit,
+            args.output_dir,
+            callback=args.callback,
+            base_latency=args.latency,
+            failure_rate=args.failure_rate,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
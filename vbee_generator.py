@@ -1,12 +1,43 @@
 import os
-from concurrent.futures import ThreadPoolExecutor
+import re
+import asyncio
+from itertools import islice
 
 from utils_vbee import (
+    DEFAULT_CALLBACK_URL,
+    TTS_SAMPLE_RATE,
+    CallbackListener,
     load_api_key,
     send_tts_request,
     check_tts_status,
     download_audio_file,
 )
+from utils_vbee_async import run_tts_jobs
+from adaptive_executor import AIMDController, run_adaptive
+from job_ledger import JobLedger
+from tts_cache import TTSCache, tts_cache_key
+
+OUTPUT_DIR = "wavs/universal3"
+LEDGER_PATH = os.path.join(OUTPUT_DIR, "jobs.sqlite")
+CACHE_DIR = "wavs/tts_cache"
+CACHE_MAX_BYTES = 20 * 1024**3
+# audio_{index + 1}_{voice tag}_{text length}.wav, as get_audio_path names clips
+AUDIO_NAME_PATTERN = re.compile(r"audio_([1-9]\d*)_\w+_\d+\.wav")
+
+VOICE_CODES = [
+    "hn_female_ngochuyen_full_48k-fhg",
+    "hn_male_phuthang_news65dt_44k-fhg",
+    "hn_male_manhdung_news_48k-fhg",
+    "hn_male_thanhlong_talk_48k-fhg",
+    "hn_female_maiphuong_vdts_48k-fhg",
+    "sg_female_tuongvy_call_44k-fhg",
+    "sg_female_lantrinh_vdts_48k-fhg",
+    "sg_male_trungkien_vdts_48k-fhg",
+    "sg_male_minhhoang_full_48k-fhg",
+    "sg_female_thaotrinh_full_48k-fhg",
+    "hue_male_duyphuong_full_48k-fhg",
+    "hue_female_huonggiang_full_48k-fhg",
+]
 
 
 def get_voice_tag(voice_code):
@@ -19,66 +50,180 @@ def get_voice_tag(voice_code):
     return voice_tag
 
 
-def process_text(input_text, index, voice_codes, api_key):
+def get_audio_path(index, voice_tag, input_text):
+    return f"{OUTPUT_DIR}/audio_{index + 1}_{voice_tag}_{len(input_text)}.wav"
+
+
+def open_ledger():
+    ledger = JobLedger(LEDGER_PATH)
+    if ledger.is_empty() and os.path.isdir(OUTPUT_DIR):
+        # One-time import of clips generated before the ledger existed
+        entries = []
+        for entry in os.scandir(OUTPUT_DIR):
+            match = AUDIO_NAME_PATTERN.fullmatch(entry.name)
+            if match:  # Anything else in the directory isn't a clip
+                index = int(match.group(1)) - 1
+                voice_code = VOICE_CODES[index % len(VOICE_CODES)]
+                entries.append((index, voice_code, entry.path))
+        ledger.import_downloaded(entries)
+    print(f"Job ledger {LEDGER_PATH}: {ledger.summary()}")
+    return ledger
+
+
+def read_input_texts(path):
+    # Non-empty lines, read lazily so the whole file never sits in memory
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def pending_jobs(input_texts, ledger, start_index=0):
+    # (index, text) pairs not downloaded yet: gaps and failures of earlier runs
+    done = ledger.downloaded_keys() if ledger else set()
+    for index, text in islice(enumerate(input_texts), start_index, None):
+        if (index, VOICE_CODES[index % len(VOICE_CODES)]) not in done:
+            yield index, text
+
+
+def start_callback_listener():
+    # Opt-in: VBEE_CALLBACK_URL must be a public URL forwarding to this machine,
+    # e.g. a tunnel or reverse proxy to the loopback port; VBEE_CALLBACK_HOST
+    # binds another interface instead
+    public_url = os.getenv("VBEE_CALLBACK_URL")
+    if not public_url:
+        return None
+    port = int(os.getenv("VBEE_CALLBACK_PORT", "8080"))
+    host = os.getenv("VBEE_CALLBACK_HOST", "127.0.0.1")
+    listener = CallbackListener(host, port, public_url).start()
+    print(f"Listening for TTS callbacks on port {port} ({public_url})")
+    return listener
+
+
+def process_text(
+    input_text, index, voice_codes, api_key, listener=None, ledger=None, cache=None
+):
     voice_code = voice_codes[index % len(voice_codes)]
     voice_tag = get_voice_tag(voice_code)
     speed_rate = 1.0
-
-    print(f"Processing {index + 1}: {input_text}")
-    response_data = send_tts_request(api_key, input_text, voice_code, speed_rate)
-
-    if "result" in response_data and "request_id" in response_data["result"]:
-        request_id = response_data["result"]["request_id"]
-        try:
-            audio_url = check_tts_status(api_key, request_id, len(input_text))
-            local_audio_path = (
-                f"wavs/universal3/audio_{index + 1}_{voice_tag}_{len(input_text)}.wav"
-            )
-            download_audio_file(audio_url, local_audio_path)
-            print(f"Audio file saved: {local_audio_path}")
-        except Exception as e:
-            print(f"Failed to process text {index + 1}: {e}")
+    local_audio_path = get_audio_path(index, voice_tag, input_text)
+
+    # The same sentence and voice synthesized in any earlier run costs nothing
+    if cache:
+        cache_key = tts_cache_key(input_text, voice_code, speed_rate, TTS_SAMPLE_RATE)
+        if cache.fetch(cache_key, local_audio_path):
+            if ledger:
+                ledger.mark_downloaded(index, voice_code, local_audio_path)
+            print(f"Audio file reused from cache: {local_audio_path}")
+            return True
+
+    # A request accepted in an earlier run is picked up instead of paid for again
+    request_id = ledger.resumable_request_id(index, voice_code) if ledger else None
+    if request_id:
+        print(f"Resuming {index + 1} with request {request_id}")
     else:
-        print(
-            f"Request ID not found for text {index + 1}. Here's the POST response: {response_data}"
+        print(f"Processing {index + 1}: {input_text}")
+        callback_url = listener.callback_url if listener else DEFAULT_CALLBACK_URL
+        response_data = send_tts_request(
+            api_key, input_text, voice_code, speed_rate, callback_url=callback_url
+        )
+        if "result" not in response_data or "request_id" not in response_data["result"]:
+            print(
+                f"Request ID not found for text {index + 1}. Here's the POST response: {response_data}"
+            )
+            if ledger:
+                ledger.mark_failed(index, voice_code, f"No request ID: {response_data}")
+            return False
+        request_id = response_data["result"]["request_id"]
+        if ledger:
+            ledger.mark_submitted(index, voice_code, request_id)
+
+    try:
+        audio_url = check_tts_status(
+            api_key, request_id, len(input_text), listener=listener
         )
+        if ledger:
+            ledger.mark_succeeded(index, voice_code, audio_url)
+        download_audio_file(audio_url, local_audio_path)
+        if cache:
+            cache.store(cache_key, local_audio_path)
+        if ledger:
+            ledger.mark_downloaded(index, voice_code, local_audio_path)
+        print(f"Audio file saved: {local_audio_path}")
+        return True
+    except Exception as e:
+        print(f"Failed to process text {index + 1}: {e}")
+        if ledger:
+            ledger.mark_failed(index, voice_code, e)
+        return False
 
 
 def main():
     api_key = load_api_key()
+    listener = start_callback_listener()
+    ledger = open_ledger()
+    cache = TTSCache(CACHE_DIR, CACHE_MAX_BYTES)
 
-    voice_codes = [
-        "hn_female_ngochuyen_full_48k-fhg",
-        "hn_male_phuthang_news65dt_44k-fhg",
-        "hn_male_manhdung_news_48k-fhg",
-        "hn_male_thanhlong_talk_48k-fhg",
-        "hn_female_maiphuong_vdts_48k-fhg",
-        "sg_female_tuongvy_call_44k-fhg",
-        "sg_female_lantrinh_vdts_48k-fhg",
-        "sg_male_trungkien_vdts_48k-fhg",
-        "sg_male_minhhoang_full_48k-fhg",
-        "sg_female_thaotrinh_full_48k-fhg",
-        "hue_male_duyphuong_full_48k-fhg",
-        "hue_female_huonggiang_full_48k-fhg",
-    ]
-
-    with open("src/vi_universal_3.txt", "r", encoding="utf-8") as file:
-        input_texts = [line.strip() for line in file.readlines() if line.strip()]
-
-    # Adjust the range to start from index 205
+    voice_codes = VOICE_CODES
+    input_texts = read_input_texts("src/vi_universal_3.txt")
+
+    # Only gaps and failures of earlier runs are submitted; start_index still
+    # skips the head of the file
     start_index = 0
-    input_texts_subset = input_texts[start_index:]
-
-    # Using ThreadPoolExecutor to manage multiple threads
-    with ThreadPoolExecutor(max_workers=12) as executor:
-        futures = [
-            executor.submit(process_text, text, idx + start_index, voice_codes, api_key)
-            for idx, text in enumerate(input_texts_subset)
-        ]
-
-        # Wait for all futures to complete
-        for future in futures:
-            future.result()
+
+    # Jobs are pulled from the file as slots free up; the number in flight
+    # grows while Vbee keeps up and backs off on errors or slow jobs
+    controller = AIMDController(initial=12, max_limit=64)
+    jobs = (
+        (text, idx, voice_codes, api_key, listener, ledger, cache)
+        for idx, text in pending_jobs(input_texts, ledger, start_index)
+    )
+    meter = run_adaptive(process_text, jobs, controller, size=lambda job: len(job[0]))
+
+    print(meter.report(controller.concurrency, 0))
+    print(f"Job ledger: {ledger.summary()}")
+    print(f"TTS cache: {cache.stats()}")
+
+
+def main_async(concurrency=200, rate_limit=20):
+    # Single event loop with a pooled session instead of one blocked thread per job
+    api_key = load_api_key()
+    listener = start_callback_listener()
+    ledger = open_ledger()
+    cache = TTSCache(CACHE_DIR, CACHE_MAX_BYTES)
+    input_texts = read_input_texts("src/vi_universal_3.txt")
+
+    start_index = 0
+    speed_rate = 1.0
+
+    def jobs():
+        for index, text in pending_jobs(input_texts, ledger, start_index):
+            voice_code = VOICE_CODES[index % len(VOICE_CODES)]
+            path = get_audio_path(index, get_voice_tag(voice_code), text)
+            yield text, voice_code, speed_rate, path, index
+
+    def on_result(job, path, error):
+        if error:
+            print(f"Failed to process text {job[0]}: {error}")
+        else:
+            print(f"Audio file saved: {path}")
+
+    succeeded, failed = asyncio.run(
+        run_tts_jobs(
+            jobs(),
+            api_key,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            on_result=on_result,
+            listener=listener,
+            ledger=ledger,
+            cache=cache,
+        )
+    )
+    print(f"Done: {succeeded} succeeded, {failed} failed")
+    print(f"Job ledger: {ledger.summary()}")
+    print(f"TTS cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
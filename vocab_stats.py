@@ -0,0 +1,189 @@
+import argparse
+import os
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from sidecar import is_fresh, replacing, sidecar_path
+
+TABLE_SUFFIX = ".vocab.tsv"
+READ_HINT = 16 * 1024 * 1024
+MIN_PARALLEL_BYTES = 32 * 1024 * 1024
+# Runs of letters: Vietnamese syllables, no digits, underscores or punctuation
+SYLLABLE = re.compile(r"[^\W\d_]+")
+
+TONE_MARKS = {
+    "\u0300": "huyền",
+    "\u0301": "sắc",
+    "\u0309": "hỏi",
+    "\u0303": "ngã",
+    "\u0323": "nặng",
+}
+TONES = ["ngang"] + list(TONE_MARKS.values())
+VOWELS = "aăâeêioôơuưy"
+
+
+def tokenize(text):
+    return SYLLABLE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def count_tokens(lines):
+    counts = Counter()
+    for line in lines:
+        counts.update(tokenize(line))
+    return counts
+
+
+def count_range(path, start, end):
+    # Counts the lines that start inside [start, end) of the file
+    counts = Counter()
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # The line crossing start belongs to the previous range
+        position = f.tell()
+        while position < end:
+            lines = f.readlines(READ_HINT)
+            if not lines:
+                break
+            block = []
+            for line in lines:
+                if position >= end:
+                    break
+                block.append(line)
+                position += len(line)
+            counts.update(tokenize(b"".join(block).decode("utf-8", errors="replace")))
+    return counts
+
+
+def table_path(path):
+    return sidecar_path(path, TABLE_SUFFIX)
+
+
+def save_table(counts, path):
+    with replacing(path) as temp_path, open(temp_path, "w", encoding="utf-8") as f:
+        for word, count in counts.most_common():
+            f.write(f"{word}\t{count}\n")
+
+
+def load_table(path):
+    counts = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            word, count = line.rstrip("\n").split("\t")
+            counts[word] = int(count)
+    return counts
+
+
+def count_vocabulary(path, workers=None, use_cache=True):
+    """
+    Syllable frequencies of a text file, counted over newline-aligned byte
+    ranges in parallel worker processes and merged. The table is saved next to
+    the file as <path>.vocab.tsv and reused until the file changes.
+    """
+    cached = table_path(path)
+    if use_cache and is_fresh(cached, path):
+        return load_table(cached)
+
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or size < MIN_PARALLEL_BYTES:
+        counts = count_range(path, 0, size)
+    else:
+        bounds = [size * i // workers for i in range(workers + 1)]
+        counts = Counter()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = executor.map(
+                count_range, [path] * workers, bounds[:-1], bounds[1:]
+            )
+            for shard in shards:
+                counts.update(shard)
+
+    if use_cache:
+        save_table(counts, cached)
+    return counts
+
+
+def toned_vowels(word):
+    # (vowel letter, tone) of each vowel grapheme, e.g. "ờ" -> ("ơ", "huyền")
+    for char in word:
+        decomposed = unicodedata.normalize("NFD", char)
+        tone = next((TONE_MARKS[m] for m in decomposed if m in TONE_MARKS), "ngang")
+        base = unicodedata.normalize(
+            "NFC", "".join(m for m in decomposed if m not in TONE_MARKS)
+        )
+        if base in VOWELS:
+            yield base, tone
+
+
+def syllable_tone(word):
+    for mark in unicodedata.normalize("NFD", word):
+        if mark in TONE_MARKS:
+            return TONE_MARKS[mark]
+    return "ngang"
+
+
+def vocabulary_report(counts, reference=None):
+    """
+    Summary of a frequency table: token and unique-syllable counts, the share
+    of tokens per tone, how many of the 72 toned vowel graphemes occur and,
+    against a reference table, the share of its syllables (by type and by
+    token) that the corpus covers.
+    """
+    tokens = sum(counts.values())
+    tone_tokens = Counter()
+    graphemes = set()
+    for word, count in counts.items():
+        tone_tokens[syllable_tone(word)] += count
+        graphemes.update(toned_vowels(word))
+
+    report = {
+        "tokens": tokens,
+        "unique_words": len(counts),
+        "tones": {
+            tone: tone_tokens[tone] / tokens if tokens else 0.0 for tone in TONES
+        },
+        "toned_vowel_coverage": len(graphemes) / (len(VOWELS) * len(TONES)),
+    }
+    if reference:
+        covered = [word for word in reference if word in counts]
+        report["syllable_coverage"] = len(covered) / len(reference)
+        report["token_coverage"] = sum(reference[word] for word in covered) / sum(
+            reference.values()
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Vocabulary, syllable and tone coverage statistics of a text file."
+    )
+    parser.add_argument("path")
+    parser.add_argument(
+        "--reference", help="Corpus to measure syllable coverage against"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    counts = count_vocabulary(args.path, args.workers)
+    reference = (
+        count_vocabulary(args.reference, args.workers) if args.reference else None
+    )
+    report = vocabulary_report(counts, reference)
+
+    print(f"Tokens: {report['tokens']}, unique words: {report['unique_words']}")
+    print(f"Toned vowel coverage: {report['toned_vowel_coverage']:.1%}")
+    print(
+        "Tones: "
+        + ", ".join(f"{tone} {share:.1%}" for tone, share in report["tones"].items())
+    )
+    if reference:
+        print(
+            f"Syllable coverage of {args.reference}: {report['syllable_coverage']:.1%} "
+            f"of syllables, {report['token_coverage']:.1%} of tokens"
+        )
+
+
+if __name__ == "__main__":
+    main()
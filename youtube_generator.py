@@ -1,57 +1,67 @@
 """ Filename: youtube_generator.py - Directory: ./ """
 
-from pytube import YouTube
-import ffmpeg
+import argparse
 import os
-import speech_recognition as sr
+from transcriber import (
+    TRANSCRIPT_CACHE_PATH,
+    GoogleBackend,
+    TranscriptCache,
+    transcribe_chunks,
+    write_transcripts,
+)
+from youtube_ingest import ingest_source
 
 
 def process_youtube_audio(url, output_dir):
     """
-    Downloads audio from a YouTube video, converts it to WAV, and transcribes it.
+    Decodes the audio of a YouTube video straight into speech chunks and
+    transcribes them. The full audio is never written to disk.
 
     Args:
     url (str): The URL of the YouTube video.
-    output_dir (str): Directory where the WAV and transcription files will be saved.
+    output_dir (str): Directory where the chunks and transcription file will be saved.
 
     Returns:
-    tuple: Path to the saved WAV file and path to the saved transcription text file.
+    tuple: Path to the folder of chunk WAV files and path to the saved transcription
+    text file, one "<chunk path> <text>" line per speech chunk.
     """
     # Initialize paths and filenames
     filename = "downloaded_audio"
     os.makedirs(output_dir, exist_ok=True)
-    mp4_path = os.path.join(output_dir, filename + ".mp4")
-    wav_path = os.path.join(output_dir, filename + ".wav")
+    chunk_folder = os.path.join(output_dir, filename + "_chunks")
     transcript_path = os.path.join(output_dir, filename + "_transcription.txt")
 
-    # Download the audio from YouTube
-    yt = YouTube(url)
-    audio_stream = yt.streams.get_audio_only()
-    audio_stream.download(output_path=output_dir, filename=filename + ".mp4")
-
-    # Convert the downloaded MP4 to WAV
-    ffmpeg.input(mp4_path).output(wav_path).run(overwrite_output=True)
-    os.remove(mp4_path)  # Clean up the MP4 file
-
-    # Transcribe the WAV file
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(wav_path) as source:
-        audio_data = recognizer.record(source)  # Load audio to memory
-        try:
-            text = recognizer.recognize_google(audio_data, language="vi-VN")
-            with open(transcript_path, "w") as file:
-                file.write(text)
-        except (sr.UnknownValueError, sr.RequestError) as e:
-            print(f"Error during transcription: {e}")
-            text = ""
-
-    print("Processing complete. WAV and transcription files saved.")
-    return (wav_path, transcript_path)
-
-
-# Example usage:
-url = "https://www.youtube.com/watch?v=FWINvusp1U8"
-output_dir = "./output"
-wav_file, transcript_file = process_youtube_audio(url, output_dir)
-print(f"WAV file saved at: {wav_file}")
-print(f"Transcription saved at: {transcript_file}")
+    # Pipe the audio stream through ffmpeg into the speech chunker, keeping the
+    # first 6 s too: the whole video is transcribed
+    chunk_paths = ingest_source(url, chunk_folder, filename, skip_intro=False)
+
+    # Transcribe the speech chunks in parallel
+    cache = TranscriptCache(TRANSCRIPT_CACHE_PATH)
+    texts, _ = transcribe_chunks(chunk_paths, GoogleBackend(language="vi-VN"), cache)
+    cache.close()
+    for path, text in zip(chunk_paths, texts):
+        if text is None:
+            print(f"Error during transcription of {path}")
+    write_transcripts(chunk_paths, texts, transcript_path)
+
+    print("Processing complete. Chunk and transcription files saved.")
+    return (chunk_folder, transcript_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cut a YouTube video into speech chunks and transcribe them."
+    )
+    parser.add_argument(
+        "url", nargs="?", default="https://www.youtube.com/watch?v=FWINvusp1U8"
+    )
+    parser.add_argument("--output-dir", default="./output")
+    args = parser.parse_args()
+
+    chunk_folder, transcript_file = process_youtube_audio(args.url, args.output_dir)
+    print(f"Chunks saved in: {chunk_folder}")
+    print(f"Transcription saved at: {transcript_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+
+import ffmpeg
+import numpy as np
+
+from utils_audio import ANALYSIS_BLOCK_MS, block_frames, chunk_pcm_blocks
+
+INGEST_SAMPLE_RATE = 22050
+
+
+def resolve_source(source):
+    """
+    (ffmpeg input, input options, name) of a YouTube URL or a local media
+    file. For a URL yt-dlp only looks up the direct link of the best audio
+    stream, which ffmpeg then reads itself; local files stand in for
+    YouTube in tests.
+    """
+    if os.path.exists(source):
+        return source, {}, os.path.splitext(os.path.basename(source))[0]
+    from yt_dlp import YoutubeDL  # Slow to import; local files don't need it
+
+    with YoutubeDL({"quiet": True, "format": "bestaudio/best"}) as ydl:
+        info = ydl.extract_info(source, download=False)
+    options = {"reconnect": 1, "reconnect_streamed": 1, "reconnect_delay_max": 5}
+    headers = info.get("http_headers") or {}
+    if headers:
+        options["headers"] = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return info["url"], options, info["id"]
+
+
+def pcm_blocks(stream, frame_rate, block_ms=ANALYSIS_BLOCK_MS):
+    # Mono 16-bit blocks from a pipe, split the way chunk_pcm_blocks expects
+    block_start = 0
+    while True:
+        size = block_frames(block_start, block_start + block_ms, frame_rate) * 2
+        data = stream.read(size)  # Blocks until size bytes or the end
+        if len(data) >= 2:
+            yield np.frombuffer(data[: len(data) // 2 * 2], dtype=np.int16)[:, None]
+        if len(data) < size:
+            return
+        block_start += block_ms
+
+
+def ingest_source(
+    source,
+    output_folder,
+    output_file_name=None,
+    sample_rate=INGEST_SAMPLE_RATE,
+    **chunk_options,
+):
+    """
+    Decodes a YouTube URL or local media file once, with ffmpeg writing mono
+    16-bit PCM at sample_rate to a pipe, and cuts it into speech chunks as
+    it arrives. Nothing is kept on disk but the chunks. chunk_options go to
+    chunk_pcm_blocks. Returns the exported chunk paths.
+    """
+    url, input_options, name = resolve_source(source)
+    process = (
+        ffmpeg.input(url, **input_options)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+        .global_args("-nostdin", "-loglevel", "error")
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        chunk_paths = chunk_pcm_blocks(
+            pcm_blocks(process.stdout, sample_rate),
+            sample_rate,
+            2,
+            output_folder,
+            output_file_name or name,
+            **chunk_options,
+        )
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode} on {source}")
+    return chunk_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cut YouTube videos or local media files into speech chunks "
+        "without storing the full audio."
+    )
+    parser.add_argument("sources", nargs="+", help="URLs, media files or URL lists")
+    parser.add_argument("--output-dir", default="./output/chunks")
+    parser.add_argument("--rate", type=int, default=INGEST_SAMPLE_RATE)
+    args = parser.parse_args()
+
+    sources = []
+    for source in args.sources:
+        if source.endswith(".txt") and os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as f:
+                sources.extend(line.strip() for line in f if line.strip())
+        else:
+            sources.append(source)
+
+    for source in sources:
+        try:
+            chunk_paths = ingest_source(source, args.output_dir, sample_rate=args.rate)
+            print(f"{source}: {len(chunk_paths)} chunks")
+        except Exception as e:
+            print(f"Failed to ingest {source}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,119 +1,277 @@
+import argparse
 import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from yt_dlp import YoutubeDL
 import ffmpeg
 
+# The 11-character id in watch, youtu.be, shorts, embed and live URLs
+VIDEO_ID_PATTERN = re.compile(
+    r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([\w-]{11})"
+)
 
-def get_video_title(url):
+
+def sanitize_filename(filename):
+    """
+    Sanitizes a string to be used as a valid filename.
+
+    Args:
+    filename (str): The original filename.
+
+    Returns:
+    str: The sanitized filename.
+    """
+    return "".join(c if c.isalnum() else "_" for c in filename)
+
+
+def video_id(url):
     """
-    Extracts the video title from the given YouTube URL.
+    Extracts the YouTube video id from a URL, or returns None if it has none.
 
     Args:
     url (str): The URL of the YouTube video.
 
     Returns:
-    str: The title of the video.
+    str: The 11-character video id.
     """
-    ydl_opts = {"quiet": True, "format": "best", "extract_flat": True}
-    with YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(url, download=False)
-        return info_dict["title"]
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
 
 
-def sanitize_filename(filename):
+def read_video_urls(input_file):
     """
-    Sanitizes a string to be used as a valid filename.
+    Reads the URLs of a file, keeping the first URL of each video so shorts,
+    watch and youtu.be links to the same video are downloaded once.
 
     Args:
-    filename (str): The original filename.
+    input_file (str): Path to the input file containing YouTube URLs.
 
     Returns:
-    str: The sanitized filename.
+    dict: Video id (or the URL itself if it has none) to URL, in file order.
     """
-    return "".join(c if c.isalnum() else "_" for c in filename)
+    urls = {}
+    with open(input_file, "r", encoding="utf-8") as file:
+        for line in file:
+            url = line.strip()
+            if url:
+                urls.setdefault(video_id(url) or url, url)
+    return urls
 
 
-def download_youtube_video_audio(url, output_dir):
+class DownloadArchive:
     """
-    Downloads a video and audio from YouTube, saves them as MP4 and WAV files,
-    and combines them into a final MP4 file with audio.
+    Ids of the videos that finished downloading and converting, one
+    "youtube <id>" line each as in yt-dlp's download archive. Lines are
+    appended as videos finish, so an interrupted run picks up where it
+    stopped. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ids = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.ids = {line.split()[-1] for line in file if line.strip()}
+
+    def __contains__(self, video_id):
+        return video_id in self.ids
+
+    def add(self, video_id):
+        with self.lock:
+            if video_id in self.ids:
+                return
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(f"youtube {video_id}\n")
+            self.ids.add(video_id)
+
+
+def fetch_video_info(url):
+    """
+    Extracts the metadata of a YouTube video, including its formats, without
+    downloading it.
 
     Args:
     url (str): The URL of the YouTube video.
-    output_dir (str): Directory where the files will be saved.
 
     Returns:
-    tuple: Paths to the saved WAV audio file and final MP4 video with audio.
+    dict: The yt-dlp info dict of the video.
     """
-    # Get the video title to use as the filenames
-    video_title = get_video_title(url)
-    sanitized_title = sanitize_filename(video_title)
+    with YoutubeDL({"quiet": True}) as ydl:
+        return ydl.extract_info(url, download=False)
 
-    # Initialize paths and filenames
-    temp_video_mp4_path = os.path.join(output_dir, sanitized_title + "_temp.mp4")
-    audio_wav_path = os.path.join(output_dir, sanitized_title + ".wav")
-    final_mp4_path = os.path.join(output_dir, sanitized_title + ".mp4")
 
+def download_video(info, output_dir):
+    """
+    Downloads a video and its audio as one MP4 file, reusing metadata already
+    fetched with fetch_video_info.
+
+    Args:
+    info (dict): The yt-dlp info dict of the video.
+    output_dir (str): Directory where the file will be saved.
+
+    Returns:
+    str: Path to the MP4 file.
+    """
+    # The id keeps videos with the same (sanitized) title apart
+    name = f"{sanitize_filename(info['title'])}_{info['id']}"
     os.makedirs(output_dir, exist_ok=True)
 
-    # Options for yt-dlp to download video without audio
-    ydl_video_opts = {
-        "format": "bestvideo",
-        "outtmpl": temp_video_mp4_path,
+    # One yt-dlp run fetches both streams and muxes them into the MP4 without
+    # re-encoding, instead of downloading the audio a second time as WAV
+    ydl_opts = {
+        "quiet": True,
+        "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best",
+        "outtmpl": os.path.join(output_dir, name + ".%(ext)s"),
+        "merge_output_format": "mp4",
     }
+    with YoutubeDL(ydl_opts) as ydl:
+        result = ydl.process_ie_result(info, download=True)
+        # Where yt-dlp actually wrote the file, after merging or remuxing
+        downloads = result.get("requested_downloads") or []
+        return downloads[0]["filepath"] if downloads else ydl.prepare_filename(result)
 
-    # Options for yt-dlp to download audio only
-    ydl_audio_opts = {
-        "format": "bestaudio",
-        "outtmpl": os.path.join(output_dir, sanitized_title + ".%(ext)s"),
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "wav",
-                "preferredquality": "192",
-            }
-        ],
-    }
 
-    # Download the video (without audio)
-    with YoutubeDL(ydl_video_opts) as ydl:
-        ydl.download([url])
+def extract_wav_audio(mp4_path):
+    """
+    Decodes the audio track of a local MP4 file to a WAV file next to it.
 
-    # Download the audio (as WAV)
-    with YoutubeDL(ydl_audio_opts) as ydl:
-        ydl.download([url])
+    Args:
+    mp4_path (str): Path to the MP4 file.
 
-    # Combine video and audio into final MP4 file
-    input_video = ffmpeg.input(temp_video_mp4_path)
-    input_audio = ffmpeg.input(audio_wav_path)
-    ffmpeg.output(
-        input_video, input_audio, final_mp4_path, vcodec="copy", acodec="aac"
+    Returns:
+    tuple: Paths to the WAV audio file and the MP4 video.
+    """
+    audio_wav_path = os.path.splitext(mp4_path)[0] + ".wav"
+    ffmpeg.input(mp4_path).output(audio_wav_path, vn=None).global_args(
+        "-loglevel", "error"
     ).run(overwrite_output=True)
+    return audio_wav_path, mp4_path
 
-    # Remove the temporary video file
-    os.remove(temp_video_mp4_path)
 
+def download_youtube_video_audio(url, output_dir):
+    """
+    Downloads a YouTube video with its audio as one MP4 file and saves the
+    audio track as a WAV file.
+
+    Args:
+    url (str): The URL of the YouTube video.
+    output_dir (str): Directory where the files will be saved.
+
+    Returns:
+    tuple: Paths to the saved WAV audio file and final MP4 video with audio.
+    """
+    audio_wav_path, final_mp4_path = extract_wav_audio(
+        download_video(fetch_video_info(url), output_dir)
+    )
     print(f"Download and processing complete for {url}")
     return audio_wav_path, final_mp4_path
 
 
-def process_video_list(input_file, output_dir):
+def process_video_list(
+    input_file,
+    output_dir,
+    download_workers=4,
+    convert_workers=2,
+    metadata_workers=8,
+    archive_path=None,
+):
     """
     Processes a list of YouTube URLs from a file, downloading and combining video and audio for each.
+    Metadata lookups, downloads and ffmpeg conversions run in separate bounded
+    thread pools, so the next videos download while earlier ones convert.
+    Videos listed more than once are processed once, and videos in the
+    archive (output_dir/downloaded.txt by default) are skipped.
 
     Args:
     input_file (str): Path to the input file containing YouTube URLs.
     output_dir (str): Directory where the files will be saved.
+    download_workers (int): Videos downloading at the same time.
+    convert_workers (int): ffmpeg conversions running at the same time.
+    metadata_workers (int): Metadata lookups running at the same time.
+    archive_path (str): File recording the ids of finished videos.
+
+    Returns:
+    tuple: Numbers of videos completed, skipped as already done, and failed.
     """
-    with open(input_file, "r") as file:
-        urls = file.readlines()
+    os.makedirs(output_dir, exist_ok=True)
+    urls = read_video_urls(input_file)
+    archive = DownloadArchive(
+        archive_path or os.path.join(output_dir, "downloaded.txt")
+    )
+    pending = [video for video in urls if video not in archive]
+    skipped = len(urls) - len(pending)
+    completed = failed = 0
+
+    with ThreadPoolExecutor(metadata_workers) as metadata, ThreadPoolExecutor(
+        download_workers
+    ) as downloads, ThreadPoolExecutor(convert_workers) as conversions:
+        # Each video moves metadata -> download -> convert; the stage it is in
+        # is kept with its future
+        in_flight = {}
+        queue = iter(pending)
+        # Stream links in the metadata expire after some hours, so lookups
+        # only run this far ahead of the downloads
+        lookahead = metadata_workers + 2 * download_workers
+
+        def top_up():
+            waiting = sum(stage != "convert" for stage, _ in in_flight.values())
+            for _ in range(lookahead - waiting):
+                video = next(queue, None)
+                if video is None:
+                    return
+                future = metadata.submit(fetch_video_info, urls[video])
+                in_flight[future] = ("metadata", video)
+
+        top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, video = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Failed at {stage} for {urls[video]}: {e}")
+                    failed += 1
+                    continue
+                if stage == "metadata":
+                    future = downloads.submit(download_video, result, output_dir)
+                    in_flight[future] = ("download", video)
+                elif stage == "download":
+                    future = conversions.submit(extract_wav_audio, result)
+                    in_flight[future] = ("convert", video)
+                else:
+                    archive.add(video)
+                    completed += 1
+                    print(f"Download and processing complete for {urls[video]}")
+            top_up()
+
+    print(f"{completed} videos done, {skipped} already done, {failed} failed")
+    return completed, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download the YouTube videos listed in a file as MP4 and WAV files."
+    )
+    parser.add_argument("input_file", nargs="?", default="input/video.txt")
+    parser.add_argument("--output-dir", default="./output")
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--convert-workers", type=int, default=2)
+    parser.add_argument("--metadata-workers", type=int, default=8)
+    parser.add_argument("--archive", help="Defaults to OUTPUT_DIR/downloaded.txt")
+    args = parser.parse_args()
 
-    for url in urls:
-        url = url.strip()
-        if url:
-            download_youtube_video_audio(url, output_dir)
+    process_video_list(
+        args.input_file,
+        args.output_dir,
+        args.download_workers,
+        args.convert_workers,
+        args.metadata_workers,
+        args.archive,
+    )
 
 
-# Example usage:
-input_file = "input/video.txt"
-output_dir = "./output"
-process_video_list(input_file, output_dir)
+if __name__ == "__main__":
+    main()